@@ -0,0 +1,191 @@
+"""Microbenchmarks for the per-frame hot path.
+
+Runs on a plain Linux box: frames are synthetic and PersonDetector uses a stub
+interpreter whose invoke() is free, so `detect` measures only pre/post-processing.
+
+    python bench_hot_paths.py                  # run and compare against the saved baseline
+    python bench_hot_paths.py --save-baseline  # run and store the results as the new baseline
+    python bench_hot_paths.py --threshold 0.3  # fail only on >30% regressions
+
+Exit code is 1 when any benchmark is slower than its baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from synthetic import (make_stub_detector, make_synthetic_camera, synthetic_detections,
+                       synthetic_frame)
+from display import DisplayWindow
+from inference import nms, to_detection_dicts
+from presence import PresenceTracker
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines',
+                                f"{platform.node() or 'default'}.json")
+
+
+def time_call(fn, min_time=0.2, repeats=5):
+    """Best-of-`repeats` mean seconds per call, each repeat running for at least `min_time`."""
+    fn() # Warm caches and lazy initialisation
+    # Calibrate how many calls make up one repeat of roughly `min_time` seconds
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= 0.01 or number >= 1 << 20:
+            break
+        number *= 2
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def build_benchmarks():
+    """name -> zero-argument callable. Names are stable keys in the baseline file."""
+    benches = {}
+    frame_vga = synthetic_frame(640, 480)
+    frame_hd = synthetic_frame(1920, 1080, seed=1)
+
+    camera = make_synthetic_camera(frame_vga)
+
+    def read_new_frame():
+        camera.capture_once() # read() skips frames it already returned
+        return camera.read()
+    benches['camera.read[640x480]'] = read_new_frame
+
+    detector = make_stub_detector(latency=0.0, detections=10)
+    benches['detector.detect[640x480,stub]'] = lambda: detector.detect(frame_vga)
+    benches['detector.detect[1920x1080,stub]'] = lambda: detector.detect(frame_hd)
+
+    tiled = make_stub_detector(latency=0.0, detections=10, tile_grid=(3, 2))
+    benches['detector.detect_tiled[1920x1080,3x2,stub]'] = lambda: tiled.detect(frame_hd)
+
+    raw = [{'bbox': [10 * i, 20, 50, 120], 'score': 0.9} for i in range(10)]
+    benches['to_detection_dicts[10]'] = lambda: to_detection_dicts(raw, frame_vga.shape)
+    rng = np.random.default_rng(0)
+    boxes = np.hstack([rng.uniform(0, 1800, (60, 2)), rng.uniform(30, 200, (60, 2))]).astype(np.float32)
+    scores = rng.uniform(0.5, 1.0, 60).astype(np.float32)
+    tiles = np.arange(60) % 7 # As merged by a 3x2 grid plus the full frame
+    benches['nms[60]'] = lambda: nms(boxes, scores, containment_threshold=0.8, groups=tiles)
+
+    for cams in (2, 64):
+        tracker = PresenceTracker()
+        for cam in range(cams):
+            tracker.add_camera(cam, zones=[(0.0, 0.3, 0.6, 1.0)] if cam % 2 else None)
+        benches[f'presence.evaluate[{cams} cams]'] = lambda tracker=tracker: tracker.evaluate()
+    benches['presence.update[zones,3 det]'] = lambda: tracker.update(1, [d['bbox'] for d in raw[:3]], frame_vga.shape)
+
+    drawer = DisplayWindow("bench")
+    detections = synthetic_detections(3)
+    benches['display.draw_overlays[640x480,3 det]'] = lambda: drawer.draw_overlays(frame_vga, detections=detections, fps=19.5)
+
+    annotated = drawer.draw_overlays(frame_vga, detections=detections, fps=19.5)
+    for quality in (50, 75, 90):
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        benches[f'jpeg.encode[640x480,q{quality}]'] = lambda params=params: cv2.imencode('.jpg', annotated, params)
+
+    try:
+        benches.update(build_mqtt_benchmarks(annotated))
+    except ImportError as e:
+        print(f"[Bench] Skipping MQTT benchmarks, paho-mqtt not installed: {e}")
+    return benches
+
+
+def build_mqtt_benchmarks(annotated):
+    from mqtt_client import MQTTClient
+
+    class _Result:
+        rc = 0
+
+    class _OfflineClient:
+        """Stands in for paho so publish() measures only our serialization path."""
+        def publish(self, topic, payload, qos=0):
+            return _Result()
+
+    client = MQTTClient("localhost")
+    client.client = _OfflineClient()
+    client.is_connected = True
+    alert = {"status": "PERSON_DETECTED", "camera_id": "Camera 0",
+             "message": "Unauthorized Entrance! Person Detected from Camera 0 at 12:00:00"}
+    log = {"detection_period_end": "2024-01-01T12:00:00",
+           "camera_0_detections": [{"timestamp": "2024-01-01T12:00:00", "confidence": 0.9, "bbox": [1, 2, 3, 4]}] * 100,
+           "camera_1_detections": []}
+    jpeg = cv2.imencode('.jpg', annotated, [int(cv2.IMWRITE_JPEG_QUALITY), 75])[1].tobytes()
+    return {
+        'mqtt.publish[alert dict]': lambda: client.publish("bench/alert", alert),
+        'mqtt.publish[log dict, 100 det]': lambda: client.publish("bench/log", log),
+        'mqtt.publish[jpeg bytes]': lambda: client.publish("bench/stream", jpeg, qos=0),
+    }
+
+
+def main(args):
+    benches = build_benchmarks()
+    selected = {name: fn for name, fn in benches.items() if not args.filter or args.filter in name}
+
+    results = {}
+    for name, fn in selected.items():
+        results[name] = time_call(fn, min_time=args.min_time)
+        print(f"{name:<45} {results[name] * 1e6:>12.1f} us")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        existing = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                existing = json.load(f).get('results', {})
+        existing.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'host': platform.node(), 'python': platform.python_version(),
+                       'opencv': cv2.__version__, 'results': existing}, f, indent=4)
+        print(f"[Bench] Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[Bench] No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f).get('results', {})
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<45} {'-':>12} {now * 1e6:>10.1f}us {'new':>8}")
+            continue
+        change = (now - before) / before
+        flag = " REGRESSION" if change > args.threshold else ""
+        print(f"{name:<45} {before * 1e6:>10.1f}us {now * 1e6:>10.1f}us {change * 100:>+7.1f}%{flag}")
+        if change > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\n[Bench] {len(regressions)} benchmark(s) regressed by more than {args.threshold * 100:.0f}%: "
+              f"{', '.join(regressions)}")
+        return 1
+    print(f"\n[Bench] No regressions beyond {args.threshold * 100:.0f}%.")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown before failing, as a fraction (0.2 = 20%%)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds spent per timing repeat')
+    parser.add_argument('--filter', type=str, default=None, help='Only run benchmarks whose name contains this')
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,206 @@
+"""Synthetic multi-camera load test: how many cameras can one edge box handle?
+
+Spins up N real CameraStreams on simulated captures (synthetic frames or a looped video),
+a stub interpreter with configurable latency, and an in-process MQTT stand-in, then runs
+main.py's loop on them: the rate controller picks the due cameras, detections go through
+the same FrameProcessor (detection log, presence, viewer-gated draw, JPEG encode, publish).
+N is stepped upward until the latency/FPS SLO is broken.
+
+    python load_test.py --interpreter-latency-ms 15 --slo-p95-ms 250 --min-fps 10
+    python load_test.py --video sample.mp4 --width 1280 --height 720 --max-cameras 16
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from synthetic import LoopbackMQTTClient, SimulatedCapture, make_stub_detector, open_video
+from camera import CameraStream
+from presence import PresenceTracker
+from processing import FrameProcessor
+from rate_control import RateController
+from viewers import ViewerTracker, TOPIC_VIEWER_HEARTBEAT
+
+
+class CameraWorker:
+    """Processes a fixed set of cameras in one loop, like main.py's main loop."""
+
+    def __init__(self, cameras, detector, mqtt_client, viewer_tracker, args):
+        self.cameras = cameras # cam_id -> CameraStream
+        self.detector = detector
+        self.rate_controller = RateController(list(cameras), max_fps=args.target_fps, min_fps=args.rate_min_fps,
+                                              enabled=not args.fixed_rate)
+        self.frame_processor = FrameProcessor(mqtt_client, PresenceTracker(), self.rate_controller,
+                                              viewer_tracker=viewer_tracker, jpeg_quality=args.jpeg_quality)
+        for cam_id in cameras:
+            self.frame_processor.add_camera(cam_id)
+            self.frame_processor.presence_tracker.add_camera(cam_id)
+        self.stop_event = threading.Event()
+        self.recording = False
+        self.latencies = []
+        self.processed = {cam_id: 0 for cam_id in cameras}
+        self.loop_overruns = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.is_set():
+            loop_start = time.time()
+            for cam_id, cam in self.cameras.items():
+                if not self.rate_controller.should_process(cam_id, loop_start) or cam.stopped:
+                    continue
+                frame = cam.read()
+                if frame is None:
+                    continue # Nothing new from this camera since the last pass
+                detection_start = time.time()
+                detections, _ = self.detector.detect(frame, cam_id)
+                now = time.time()
+                self.frame_processor.process_frame(cam_id, frame, detections, now - detection_start, now)
+                if self.recording:
+                    self.latencies.append(time.time() - cam.read_frame_time)
+                    self.processed[cam_id] += 1
+            self.frame_processor.end_pass(time.time())
+            elapsed = time.time() - loop_start
+            self.rate_controller.end_loop(elapsed)
+            if elapsed < self.rate_controller.loop_interval:
+                time.sleep(self.rate_controller.loop_interval - elapsed)
+            elif self.recording:
+                self.loop_overruns += 1
+
+    def stop(self):
+        self.stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+
+def run_step(num_cameras, detector, args):
+    mqtt_client = LoopbackMQTTClient()
+    viewer_tracker = ViewerTracker(timeout=args.warmup + args.duration + 60.0)
+    mqtt_client.subscribe(TOPIC_VIEWER_HEARTBEAT, viewer_tracker.on_heartbeat)
+    if not args.no_stream: # One viewer watching every camera for the whole step
+        mqtt_client.publish(TOPIC_VIEWER_HEARTBEAT, {'viewer_id': 'load-test', 'cameras': list(range(num_cameras))})
+    cameras = {i: CameraStream(f"sim-{i}", width=args.width, height=args.height, fps=args.camera_fps,
+                               demand_driven=not args.decode_every_frame,
+                               capture=SimulatedCapture(i, fps=args.camera_fps, width=args.width, height=args.height,
+                                                        video_path=args.video)).start()
+               for i in range(num_cameras)}
+    workers = []
+    for w in range(min(args.workers, num_cameras)):
+        assigned = {cam_id: cam for cam_id, cam in cameras.items() if cam_id % args.workers == w}
+        workers.append(CameraWorker(assigned, detector, mqtt_client, viewer_tracker, args).start())
+
+    time.sleep(args.warmup)
+    start_counts = {cam_id: cam.grabbed_frames for cam_id, cam in cameras.items()}
+    for worker in workers:
+        worker.recording = True
+    start = time.perf_counter()
+    time.sleep(args.duration)
+    for worker in workers:
+        worker.recording = False
+    elapsed = time.perf_counter() - start
+    produced = sum(cam.grabbed_frames - start_counts[cam_id] for cam_id, cam in cameras.items())
+
+    for worker in workers:
+        worker.stop()
+    for cam in cameras.values():
+        cam.stop()
+
+    latencies = np.array([l for worker in workers for l in worker.latencies]) * 1000.0
+    per_camera_fps = [p / elapsed for worker in workers for p in worker.processed.values()]
+    processed = sum(sum(worker.processed.values()) for worker in workers)
+    return {
+        'cameras': num_cameras,
+        'total_fps': processed / elapsed,
+        'min_camera_fps': min(per_camera_fps) if per_camera_fps else 0.0,
+        'drop_rate': 1.0 - processed / produced if produced else 0.0,
+        'p50_ms': float(np.percentile(latencies, 50)) if latencies.size else float('inf'),
+        'p95_ms': float(np.percentile(latencies, 95)) if latencies.size else float('inf'),
+        'p99_ms': float(np.percentile(latencies, 99)) if latencies.size else float('inf'),
+        'loop_overruns': sum(worker.loop_overruns for worker in workers),
+        'mqtt_mbps': mqtt_client.bytes * 8 / elapsed / 1e6,
+    }
+
+
+def slo_violations(result, args):
+    violations = []
+    if result['p95_ms'] > args.slo_p95_ms:
+        violations.append(f"p95 {result['p95_ms']:.0f}ms > {args.slo_p95_ms:.0f}ms")
+    if result['min_camera_fps'] < args.min_fps:
+        violations.append(f"camera fps {result['min_camera_fps']:.1f} < {args.min_fps:.1f}")
+    if result['drop_rate'] > args.max_drop_rate:
+        violations.append(f"drop rate {result['drop_rate'] * 100:.0f}% > {args.max_drop_rate * 100:.0f}%")
+    return violations
+
+
+def main(args):
+    if args.video:
+        try:
+            open_video(args.video).release() # Fail before any step instead of measuring a dead camera
+        except ValueError as e:
+            raise SystemExit(f"[Load] {e}")
+    detector = make_stub_detector(latency=args.interpreter_latency_ms / 1000.0,
+                                  jitter=args.interpreter_jitter_ms / 1000.0,
+                                  cpu_interpreters=args.interpreters)
+    print(f"[Load] {args.width}x{args.height} @ {args.camera_fps} FPS per camera, "
+          f"interpreter {args.interpreter_latency_ms:.0f}ms (+{args.interpreter_jitter_ms:.0f}ms jitter) x{args.interpreters}, "
+          f"{args.workers} worker loop(s) @ {args.target_fps} FPS")
+    print(f"[Load] SLO: p95 <= {args.slo_p95_ms:.0f}ms, per-camera fps >= {args.min_fps:.1f}, "
+          f"drop rate <= {args.max_drop_rate * 100:.0f}%\n")
+    print(f"{'cams':>4} {'total fps':>9} {'min cam fps':>11} {'drop':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'overruns':>8} {'mqtt Mb/s':>9}  status")
+
+    results = []
+    capacity = 0
+    for n in range(args.start_cameras, args.max_cameras + 1, args.step):
+        result = run_step(n, detector, args)
+        violations = slo_violations(result, args)
+        result['violations'] = violations
+        results.append(result)
+        print(f"{n:>4} {result['total_fps']:>9.1f} {result['min_camera_fps']:>11.1f} {result['drop_rate'] * 100:>5.0f}% "
+              f"{result['p50_ms']:>7.1f} {result['p95_ms']:>7.1f} {result['p99_ms']:>7.1f} {result['loop_overruns']:>8} "
+              f"{result['mqtt_mbps']:>9.1f}  {'FAIL: ' + '; '.join(violations) if violations else 'ok'}")
+        if violations:
+            break
+        capacity = n
+
+    print(f"\n[Load] Capacity under this SLO: {capacity} camera(s)")
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'config': vars(args), 'capacity': capacity, 'steps': results}, f, indent=4)
+        print(f"[Load] Results written to {args.json_out}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthetic multi-camera load test")
+    parser.add_argument('--start-cameras', type=int, default=1)
+    parser.add_argument('--max-cameras', type=int, default=32)
+    parser.add_argument('--step', type=int, default=1, help='Cameras added per step')
+    parser.add_argument('--camera-fps', type=float, default=20.0, help='FPS of each simulated camera')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--video', type=str, default=None, help='Loop this video file instead of synthetic frames')
+    parser.add_argument('--interpreter-latency-ms', type=float, default=15.0, help='Stub invoke() latency')
+    parser.add_argument('--interpreter-jitter-ms', type=float, default=0.0, help='Extra random invoke() latency')
+    parser.add_argument('--interpreters', type=int, default=1, help='Stub interpreters in the detector pool')
+    parser.add_argument('--workers', type=int, default=1, help='Processing loops; cameras are split between them')
+    parser.add_argument('--target-fps', type=float, default=20.0, help='Loop and detection ceiling, like --max-fps in main.py')
+    parser.add_argument('--rate-min-fps', type=float, default=1.0, help="Like main.py's --min-fps for the rate controller")
+    parser.add_argument('--fixed-rate', action='store_true', help='Disable the adaptive rate controller, like main.py')
+    parser.add_argument('--decode-every-frame', action='store_true', help='Disable demand-driven decode, like main.py')
+    parser.add_argument('--jpeg-quality', type=int, default=75)
+    parser.add_argument('--no-stream', action='store_true', help='No viewer heartbeat, so draw/encode/publish is skipped')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Seconds per step before measuring')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per step')
+    parser.add_argument('--slo-p95-ms', type=float, default=250.0, help='Max p95 capture-to-publish latency')
+    parser.add_argument('--min-fps', type=float, default=10.0, help='Min processed FPS for every camera')
+    parser.add_argument('--max-drop-rate', type=float, default=1.0,
+                        help='Max fraction of captured frames never processed (1.0 = not part of the SLO)')
+    parser.add_argument('--json-out', type=str, default=None, help='Write all step results to this JSON file')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,244 @@
+"""Synthetic frames and a stub TFLite interpreter for benchmarks and load tests.
+
+Nothing here needs a camera, a model file or an Edge TPU, so it runs on any Linux box.
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import inference # noqa: E402  (needs SRC_DIR on sys.path)
+
+
+def synthetic_frame(width=640, height=480, seed=0):
+    """Noisy BGR frame with a few bright rectangles, so JPEG sizes are realistic."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+    for i in range(4):
+        x, y = int(width * (0.1 + 0.2 * i)), int(height * (0.2 + 0.1 * i))
+        frame[y:y + height // 4, x:x + width // 8] = (40 * i + 80, 200 - 30 * i, 120)
+    return frame
+
+
+def synthetic_detections(count=3, width=640, height=480):
+    """Detections in the {'bbox', 'score'} format main.py hands to DisplayWindow."""
+    return [{'bbox': [int(width * 0.1 * (i + 1)), int(height * 0.1), width // 10, height // 3],
+             'score': 0.9 - 0.05 * i} for i in range(count)]
+
+
+class StaticCapture:
+    """cv2.VideoCapture stand-in whose every grab is `frame`; grab() never blocks."""
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def isOpened(self):
+        return True
+
+    def open(self, src):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        import cv2
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.frame.shape[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.frame.shape[0])
+        return 0.0
+
+    def grab(self):
+        return True
+
+    def retrieve(self):
+        return True, self.frame
+
+    def release(self):
+        pass
+
+
+def make_synthetic_camera(frame):
+    """A CameraStream on a StaticCapture of `frame`, with one frame already captured.
+
+    No capture thread runs; call `capture_once()` before each `read()` for a new frame.
+    """
+    from camera import CameraStream
+    cam = CameraStream('synthetic', width=frame.shape[1], height=frame.shape[0], capture=StaticCapture(frame))
+    cam.capture_once()
+    return cam
+
+
+def make_stub_interpreter_class(latency=0.0, detections=5, person_ratio=0.6, jitter=0.0, seed=0):
+    """Returns a class with the tflite Interpreter API used by PersonDetector.
+
+    invoke() sleeps `latency` seconds (plus up to `jitter` extra, uniformly random) and
+    the outputs mimic an SSD post-processed model: boxes, classes, scores, count.
+    """
+    rng = np.random.default_rng(seed)
+
+    class StubInterpreter:
+        def __init__(self, model_path=None, num_threads=None):
+            self.model_path = model_path
+            self.num_threads = num_threads
+            n = detections
+            ymin = np.linspace(0.1, 0.5, n, dtype=np.float32)
+            xmin = np.linspace(0.05, 0.6, n, dtype=np.float32)
+            self._boxes = np.stack([ymin, xmin, ymin + 0.3, xmin + 0.2], axis=1)[None]
+            person = int(round(n * person_ratio))
+            self._classes = np.array([[0.0] * person + [1.0] * (n - person)], dtype=np.float32)
+            self._scores = np.linspace(0.95, 0.4, n, dtype=np.float32)[None]
+            self._count = np.array([n], dtype=np.float32)
+
+        def allocate_tensors(self):
+            pass
+
+        def get_input_details(self):
+            return [{'index': 0, 'shape': np.array([1, 480, 480, 3]), 'dtype': np.uint8, 'quantization': (0.0, 0)}]
+
+        def get_output_details(self):
+            return [{'index': i, 'quantization': (0.0, 0)} for i in range(4)]
+
+        def set_tensor(self, index, value):
+            self._input = value
+
+        def invoke(self):
+            delay = latency + (rng.uniform(0.0, jitter) if jitter else 0.0)
+            if delay > 0:
+                time.sleep(delay)
+
+        def get_tensor(self, index):
+            return (self._boxes, self._classes, self._scores, self._count)[index]
+
+    return StubInterpreter
+
+
+def make_stub_detector(latency=0.0, detections=5, cpu_interpreters=1, jitter=0.0, **detector_kwargs):
+    """A real PersonDetector whose CPU interpreters are stubs and whose TPU path is disabled."""
+    stub_class = make_stub_interpreter_class(latency=latency, detections=detections, jitter=jitter)
+    original_class_loader, original_pycoral_loader = inference._tflite_interpreter_class, inference._load_pycoral
+    inference._tflite_interpreter_class = lambda: stub_class
+    inference._load_pycoral = lambda: False
+    try:
+        return inference.PersonDetector('stub_edgetpu.tflite', 'stub.tflite', threshold=0.5,
+                                        cpu_interpreters=cpu_interpreters, **detector_kwargs)
+    finally:
+        inference._tflite_interpreter_class = original_class_loader
+        inference._load_pycoral = original_pycoral_loader
+
+
+def open_video(path):
+    """Opens `path` with OpenCV and checks that a first frame decodes; raises ValueError otherwise."""
+    import cv2
+    cap = cv2.VideoCapture(path)
+    ret = cap.isOpened() and cap.read()[0]
+    if not ret:
+        cap.release()
+        raise ValueError(f"cannot read video {path!r} (missing file or unsupported codec)")
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return cap
+
+
+class SimulatedCapture(StaticCapture):
+    """cv2.VideoCapture stand-in that delivers frames at `fps` like a live camera.
+
+    grab() blocks until the next frame is due; retrieve() returns a fresh copy of it,
+    standing in for the decode. Frames are synthetic images, or a video looped from
+    the start (resized to width x height). Pass it to CameraStream(capture=...).
+    """
+
+    def __init__(self, src_id, fps=20, width=640, height=480, video_path=None, variants=8):
+        super().__init__(synthetic_frame(width, height, seed=src_id * 100))
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.video_path = video_path
+        self.video = open_video(video_path) if video_path else None
+        self.frames = [synthetic_frame(width, height, seed=src_id * 100 + i) for i in range(variants)]
+        self.grabbed = 0
+        self.next_time = time.perf_counter()
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def open(self, src):
+        return self.opened
+
+    def _next_video_frame(self):
+        import cv2
+        for _ in range(2):
+            ret, frame = self.video.read()
+            if ret:
+                if frame.shape[1] != self.width or frame.shape[0] != self.height:
+                    frame = cv2.resize(frame, (self.width, self.height))
+                return frame
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0) # Loop the clip
+        return None # Nothing readable even from the start
+
+    def grab(self):
+        delay = self.next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+            self.next_time += 1.0 / self.fps
+        else:
+            self.next_time = time.perf_counter() + 1.0 / self.fps # Fell behind; do not catch up in a burst
+        if self.video is not None:
+            frame = self._next_video_frame()
+            if frame is None:
+                print(f"[Sim] Video {self.video_path} stopped decoding.")
+                return False
+            self.frame = frame
+        else:
+            self.frame = self.frames[self.grabbed % len(self.frames)]
+        self.grabbed += 1
+        return True
+
+    def retrieve(self):
+        return True, self.frame.copy()
+
+    def release(self):
+        self.opened = False
+        if self.video is not None:
+            self.video.release()
+
+
+class LoopbackMQTTClient:
+    """In-process MQTT stand-in with MQTTClient's publish() signature and serialization.
+
+    Messages are counted (and optionally handed to subscriber callbacks) instead of
+    going over the network, so load tests measure the edge pipeline, not the broker.
+    """
+
+    def __init__(self):
+        self.is_connected = True
+        self.lock = threading.Lock()
+        self.subscribers = {} # topic -> [callback(topic, payload)]
+        self.messages = 0
+        self.bytes = 0
+
+    def subscribe(self, topic, callback, qos=0):
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, payload, qos=1):
+        import json
+        if isinstance(payload, dict):
+            payload = json.dumps(payload).encode()
+        elif not isinstance(payload, bytes):
+            payload = str(payload).encode()
+        with self.lock:
+            self.messages += 1
+            self.bytes += len(payload)
+        for callback in self.subscribers.get(topic, ()):
+            callback(topic, payload)
+        return True
+
+    def disconnect(self):
+        self.is_connected = False
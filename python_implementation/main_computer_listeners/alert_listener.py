@@ -3,6 +3,8 @@ import paho.mqtt.client as mqtt
 import argparse
 import time
 import json # Added for parsing structured alerts
+import queue
+import threading
 from plyer import notification
 
 # For actual desktop notifications, you would typically use a library like 'plyer'.
@@ -16,88 +18,228 @@ from plyer import notification
 
 MQTT_TOPIC_ALERT = "smart_office/camera/alert"
 
-def on_connect(client, userdata, flags, reason_code, properties):
-    if reason_code == 0:
-        print("[AlertLis] Connected to MQTT Broker!")
-        client.subscribe(MQTT_TOPIC_ALERT)
-        print(f"[AlertLis] Subscribed to {MQTT_TOPIC_ALERT}")
-    else:
-        print(f"[AlertLis] Failed to connect, return code {reason_code}")
 
-def on_message(client, userdata, msg):
-    try:
-        payload_str = msg.payload.decode()
-        print(f"\n-------------------------------")
-        print(f"[ALERT RAW RECEIVED] {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Topic: {msg.topic}, Payload: {payload_str}")
-        
-        data = json.loads(payload_str)
-        status = data.get("status")
-        message = data.get("message", "No message content.") # Default message
-        camera_id = data.get("camera_id", "Unknown Camera")
+class NotificationDispatcher:
+    """Moves alert handling off the paho network thread.
+
+    on_message only enqueues the raw payload. A worker thread parses it and sends
+    desktop notifications through a token bucket limited to `max_per_minute`. The first
+    alert from a camera that has been quiet for `coalesce_window` seconds is notified
+    right away; follow-ups within the window of its last notification are merged (per
+    camera and across cameras) and sent when that window ends.
+    """
+
+    def __init__(self, coalesce_window=2.0, max_per_minute=6, burst=3, queue_size=1000, stats_interval=30.0):
+        self.coalesce_window = coalesce_window
+        self.max_per_minute = max_per_minute
+        self.burst = max(1, burst)
+        self.stats_interval = stats_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        # camera_id -> {"title", "message", "count", "due"}
+        self.pending = {}
+        self.last_notified = {} # camera_id -> time of its last notification
+        self.tokens = float(self.burst)
+        self.last_refill = time.time()
+        self.throttled = False # Current pending batch is waiting on the rate limit
+
+        self.stop_event = threading.Event()
+        self._worker = None
+        self.stats_lock = threading.Lock() # submit() runs on the paho thread
+
+        # Counters, reset after every stats report
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.notified = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.last_report = time.time()
+
+    def start(self):
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self._worker is not None:
+            self._worker.join(timeout=2.0)
+            if self._worker.is_alive():
+                # The worker still owns the pending alerts; flushing here would race with it
+                print("[AlertLis] Notification worker did not stop in time; skipping final flush.")
+                return
+        self._flush(force=True)
+
+    def submit(self, payload):
+        """Called from the MQTT callback. Never blocks."""
+        try:
+            self.queue.put_nowait((time.time(), payload))
+            dropped = 0
+        except queue.Full:
+            dropped = 1
+        with self.stats_lock:
+            self.received += 1
+            self.dropped += dropped
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                received_at, payload = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                received_at, payload = None, None
+
+            if payload is not None:
+                self._handle(payload)
+                latency = time.time() - received_at
+                self.processed += 1
+                self.latency_sum += latency
+                self.latency_max = max(self.latency_max, latency)
+
+            self._flush()
+            if self.stats_interval > 0 and time.time() - self.last_report >= self.stats_interval:
+                self._report()
+
+    def _handle(self, payload):
+        try:
+            payload_str = payload.decode()
+        except Exception as e:
+            print(f"[AlertLis] Could not decode payload: {e}")
+            return
+
+        try:
+            data = json.loads(payload_str)
+            status = data.get("status")
+            message = data.get("message", "No message content.") # Default message
+            camera_id = data.get("camera_id", "Unknown Camera")
+        except (json.JSONDecodeError, AttributeError):
+            # Handle cases where the payload is not JSON (e.g., older/simple string alerts)
+            print(f"[ALERT RECEIVED - Non-JSON] {time.strftime('%Y-%m-%d %H:%M:%S')} Message: {payload_str}")
+            self._add_pending("Unknown Camera", 'Smart Office Alert!', payload_str)
+            return
 
         if status == "PERSON_DETECTED":
             print(f"[ALERT] Status: PERSON_DETECTED, Camera: {camera_id}, Message: {message}")
-            try:
-                notification.notify(
-                    title=f'Smart Office: Person Detected! ({camera_id})',
-                    message=message,
-                    app_name='Smart Office Alert Listener',
-                    timeout=3  # Notification will disappear after 15 seconds
-                )
-                print("[AlertLis] Desktop notification sent for PERSON_DETECTED.")
-            except Exception as e:
-                print(f"[AlertLis] Failed to send desktop notification: {e}")
-                print("[AlertLis] Ensure 'plyer' is installed and you have a notification server running (e.g., notify-osd).")
-        
+            self._add_pending(camera_id, f'Smart Office: Person Detected! ({camera_id})', message)
         elif status == "PERSON_GONE":
             print(f"[STATUS] Status: PERSON_GONE, Camera: {camera_id}, Message: {message}")
-            # For now, we don't actively try to dismiss the old notification with plyer.
-            # It will disappear based on its own timeout. The main benefit here is stopping repeated PERSON_DETECTED notifications.
-            pass # Explicitly do nothing visual for PERSON_GONE for now
-
+            # Nothing visual for PERSON_GONE; plyer notifications expire on their own timeout.
         else:
-            # Handle messages that are JSON but don't have the expected status
             print(f"[ALERT] Received JSON with unknown status or non-alert message: {payload_str}")
-            # Optionally, notify for these as well, or just log
-            try:
-                notification.notify(
-                    title='Smart Office Alert (Unknown Status)',
-                    message=payload_str, # Show the full JSON string
-                    app_name='Smart Office Alert Listener',
-                    timeout=3
-                )
-                print("[AlertLis] Desktop notification sent for unknown status JSON.")
-            except Exception as e:
-                print(f"[AlertLis] Failed to send desktop notification for unknown status JSON: {e}")
-
-        print(f"-------------------------------\n")
-
-    except json.JSONDecodeError:
-        # Handle cases where the payload is not JSON (e.g., older/simple string alerts)
-        alert_message = msg.payload.decode() # Already decoded, but for clarity
-        print(f"\n-------------------------------")
-        print(f"[ALERT RECEIVED - Non-JSON] {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Message: {alert_message}")
-        print(f"-------------------------------\n")
+            self._add_pending(camera_id, 'Smart Office Alert (Unknown Status)', payload_str)
+
+    def _add_pending(self, camera_id, title, message):
+        entry = self.pending.get(camera_id)
+        if entry is None:
+            # Leading edge: due now unless this camera was notified within the window
+            due = max(time.time(), self.last_notified.get(camera_id, 0.0) + self.coalesce_window)
+            self.pending[camera_id] = {"title": title, "message": message, "count": 1, "due": due}
+        else:
+            # Keep the latest text, remember how many alerts were folded into it
+            entry["title"] = title
+            entry["message"] = message
+            entry["count"] += 1
+            self.coalesced += 1
+
+    def _take_token(self):
+        now = time.time()
+        if self.max_per_minute > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.max_per_minute / 60.0)
+        else:
+            self.tokens = self.burst # No limit configured
+        self.last_refill = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def _flush(self, force=False):
+        if not self.pending:
+            return
+        now = time.time()
+        if not force and now < min(entry["due"] for entry in self.pending.values()):
+            return
+        if not force and not self._take_token():
+            # Keep accumulating until the bucket refills; alerts are merged, not lost.
+            if not self.throttled:
+                self.rate_limited += 1
+                self.throttled = True
+            return
+
+        entries = self.pending
+        self.pending = {}
+        self.throttled = False
+        for camera_id in entries:
+            self.last_notified[camera_id] = now
+        if len(entries) == 1:
+            camera_id, entry = next(iter(entries.items()))
+            title = entry["title"]
+            message = entry["message"]
+            if entry["count"] > 1:
+                message = f"{message} (+{entry['count'] - 1} more alerts)"
+        else:
+            # Several cameras fired within the window: one notification for all of them
+            title = f'Smart Office: Alerts from {len(entries)} cameras'
+            message = "\n".join(
+                f"{camera_id}: {entry['count']} alert(s)" for camera_id, entry in sorted(entries.items())
+            )
+        self._notify(title, message)
+
+    def _notify(self, title, message):
         try:
             notification.notify(
-                title='Smart Office Alert!',
-                message=alert_message,
+                title=title,
+                message=message,
                 app_name='Smart Office Alert Listener',
-                timeout=3  # Notification will disappear after 10 seconds
+                timeout=3
             )
-            print("[AlertLis] Desktop notification sent for non-JSON message.")
+            self.notified += 1
+            print(f"[AlertLis] Desktop notification sent: {title}")
         except Exception as e:
-            print(f"[AlertLis] Failed to send desktop notification for non-JSON: {e}")
+            print(f"[AlertLis] Failed to send desktop notification: {e}")
             print("[AlertLis] Ensure 'plyer' is installed and you have a notification server running (e.g., notify-osd).")
-    except Exception as e:
-        # Catch any other unexpected errors during message processing
-        print(f"[AlertLis] Critical error processing message: {e}")
-        print(f"Original payload: {msg.payload.decode() if msg else 'N/A'}")
+
+    def _report(self):
+        with self.stats_lock:
+            received, dropped = self.received, self.dropped
+            self.received = self.dropped = 0
+        elapsed = max(time.time() - self.last_report, 1e-6)
+        avg_latency_ms = (self.latency_sum / self.processed * 1000.0) if self.processed else 0.0
+        print(f"[AlertLis][Stats] rate={received / elapsed * 60.0:.0f}/min backlog={self.queue.qsize()} "
+              f"pending_cameras={len(self.pending)} processed={self.processed} dropped={dropped} "
+              f"notified={self.notified} coalesced={self.coalesced} rate_limited={self.rate_limited} "
+              f"latency_avg={avg_latency_ms:.1f}ms latency_max={self.latency_max * 1000.0:.1f}ms")
+        self.processed = 0
+        self.notified = self.coalesced = self.rate_limited = 0
+        self.latency_sum = self.latency_max = 0.0
+        self.last_report = time.time()
+
+
+def on_connect(client, userdata, flags, reason_code, properties):
+    if reason_code == 0:
+        print("[AlertLis] Connected to MQTT Broker!")
+        client.subscribe(MQTT_TOPIC_ALERT)
+        print(f"[AlertLis] Subscribed to {MQTT_TOPIC_ALERT}")
+    else:
+        print(f"[AlertLis] Failed to connect, return code {reason_code}")
+
+def on_message(client, userdata, msg):
+    # Hand off immediately so the network loop is never stalled by parsing or notifications
+    userdata.submit(msg.payload)
 
 def main(args):
-    client = mqtt.Client(client_id=f"alert-listener-{int(time.time())}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+    dispatcher = NotificationDispatcher(
+        coalesce_window=args.coalesce_window,
+        max_per_minute=args.max_notifications_per_minute,
+        burst=args.notification_burst,
+        queue_size=args.queue_size,
+        stats_interval=args.stats_interval
+    ).start()
+
+    client = mqtt.Client(client_id=f"alert-listener-{int(time.time())}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+                         userdata=dispatcher)
     client.on_connect = on_connect
     client.on_message = on_message
 
@@ -121,11 +263,20 @@ def main(args):
         if client.is_connected():
             client.loop_stop()
             client.disconnect()
+        dispatcher.stop()
         print("[AlertLis] Disconnected. Exited.")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="MQTT Alert Listener")
     parser.add_argument('--mqtt-broker', type=str, default='localhost', help='MQTT broker address')
     parser.add_argument('--mqtt-port', type=int, default=1883, help='MQTT broker port')
+    parser.add_argument('--coalesce-window', type=float, default=2.0,
+                        help='Seconds after a notification during which further alerts are merged into the next one')
+    parser.add_argument('--max-notifications-per-minute', type=float, default=6,
+                        help='Desktop notification rate limit (0 disables the limit)')
+    parser.add_argument('--notification-burst', type=int, default=3, help='Notifications allowed back-to-back')
+    parser.add_argument('--queue-size', type=int, default=1000, help='Max queued alerts before new ones are dropped')
+    parser.add_argument('--stats-interval', type=float, default=30.0,
+                        help='Seconds between backlog/latency reports (0 disables)')
     args = parser.parse_args()
-    main(args) 
\ No newline at end of file
+    main(args)
@@ -3,10 +3,15 @@ import cv2
 import paho.mqtt.client as mqtt
 import numpy as np
 import argparse
+import json
 import time
 
 MQTT_TOPIC_STREAM_0 = "smart_office/camera/0/stream"
 MQTT_TOPIC_STREAM_1 = "smart_office/camera/1/stream"
+# The edge node only encodes cameras that some viewer has announced via this heartbeat
+MQTT_TOPIC_VIEWER_HEARTBEAT = "smart_office/viewer/heartbeat"
+HEARTBEAT_INTERVAL = 2.0 # Seconds; the edge node forgets a viewer after ~3 missed heartbeats
+WATCHED_CAMERAS = [0, 1]
 
 # Global dictionary to store the latest frame for each camera
 latest_frames = {MQTT_TOPIC_STREAM_0: None, MQTT_TOPIC_STREAM_1: None}
@@ -15,11 +20,16 @@ last_message_time = {MQTT_TOPIC_STREAM_0: 0, MQTT_TOPIC_STREAM_1: 0}
 WINDOW_CAM_0 = "Camera 0 Stream"
 WINDOW_CAM_1 = "Camera 1 Stream"
 
+def heartbeat_payload(viewer_id, cameras):
+    return json.dumps({"viewer_id": viewer_id, "cameras": cameras})
+
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         print("[Viewer] Connected to MQTT Broker!")
         client.subscribe([(MQTT_TOPIC_STREAM_0, 0), (MQTT_TOPIC_STREAM_1, 0)])
         print(f"[Viewer] Subscribed to {MQTT_TOPIC_STREAM_0} and {MQTT_TOPIC_STREAM_1}")
+        # Announce right away so the edge node resumes streaming on its next frame
+        client.publish(MQTT_TOPIC_VIEWER_HEARTBEAT, heartbeat_payload(userdata, WATCHED_CAMERAS), qos=1)
     else:
         print(f"[Viewer] Failed to connect, return code {rc}")
 
@@ -38,9 +48,12 @@ def on_message(client, userdata, msg):
         print(f"[Viewer] Error processing message on {msg.topic}: {e}")
 
 def main(args):
-    client = mqtt.Client(client_id=f"viewer-{int(time.time())}")
+    viewer_id = f"viewer-{int(time.time())}"
+    client = mqtt.Client(client_id=viewer_id, userdata=viewer_id)
     client.on_connect = on_connect
     client.on_message = on_message
+    # If this viewer drops off without saying goodbye, the broker tells the edge node for us
+    client.will_set(MQTT_TOPIC_VIEWER_HEARTBEAT, heartbeat_payload(viewer_id, []), qos=1)
 
     print(f"[Viewer] Connecting to broker at {args.mqtt_broker}:{args.mqtt_port}")
     try:
@@ -54,8 +67,13 @@ def main(args):
     cv2.namedWindow(WINDOW_CAM_0, cv2.WINDOW_NORMAL)
     cv2.namedWindow(WINDOW_CAM_1, cv2.WINDOW_NORMAL)
 
+    last_heartbeat_time = time.time()
     try:
         while True:
+            if time.time() - last_heartbeat_time >= HEARTBEAT_INTERVAL:
+                client.publish(MQTT_TOPIC_VIEWER_HEARTBEAT, heartbeat_payload(viewer_id, WATCHED_CAMERAS), qos=0)
+                last_heartbeat_time = time.time()
+
             frame0 = latest_frames[MQTT_TOPIC_STREAM_0]
             frame1 = latest_frames[MQTT_TOPIC_STREAM_1]
 
@@ -93,6 +111,11 @@ def main(args):
         print("[Viewer] Interrupted by user (Ctrl+C)")
     finally:
         print("[Viewer] Cleaning up...")
+        try:
+            # Tell the edge node to stop encoding for us
+            client.publish(MQTT_TOPIC_VIEWER_HEARTBEAT, heartbeat_payload(viewer_id, []), qos=1).wait_for_publish(timeout=1.0)
+        except Exception as e:
+            print(f"[Viewer] Could not send goodbye heartbeat: {e}")
         client.loop_stop()
         client.disconnect()
         cv2.destroyAllWindows()
@@ -1,22 +1,67 @@
 import cv2
+import os
 import threading
 import time
 
+# Capture modes most UVC webcams offer, tried when matching the model input size
+COMMON_CAPTURE_SIZES = [(320, 240), (424, 240), (640, 360), (640, 480), (800, 448), (800, 600),
+                        (848, 480), (960, 540), (1024, 576), (1280, 720), (1600, 896), (1920, 1080)]
+
+
+def closest_capture_sizes(target_width, target_height, sizes=COMMON_CAPTURE_SIZES):
+    """Candidate sizes, most preferred first: the smallest ones covering the target, then
+    those that would need upscaling (largest first)."""
+    covering = sorted((s for s in sizes if s[0] >= target_width and s[1] >= target_height),
+                      key=lambda s: s[0] * s[1])
+    smaller = sorted((s for s in sizes if s not in covering), key=lambda s: -s[0] * s[1])
+    return covering + smaller
+
+
 class CameraStream:
-    def __init__(self, src, width=640, height=480, fps=20):
+    """Background capture from one camera.
+
+    The capture thread grab()s every frame to keep the driver buffer fresh but only
+    retrieve()s (decodes) when a consumer is about to ask for a new frame, so frames
+    nobody reads are never decoded. `demand_driven=False` decodes every frame.
+    read() never returns the same frame twice: it returns None until a new one is decoded.
+    With `match_size=(w, h)` the camera is opened at the supported resolution closest
+    to that size (e.g. the model input) instead of `width` x `height`.
+    `capture` replaces `cv2.VideoCapture(src)` with any object offering the same API
+    (isOpened, open, set, get, grab, retrieve, release), e.g. the simulated cameras in
+    benchmarks/. Without start(), callers can drive capture themselves with capture_once().
+    """
+
+    def __init__(self, src, width=640, height=480, fps=20, demand_driven=True, match_size=None, replay_speed=1.0,
+                 capture=None):
         self.src = src
         self.width = width
         self.height = height
         self.fps = fps if fps > 0 else 1 # Avoid division by zero later, ensure a minimal delay
-        self.cap = cv2.VideoCapture(self.src)
+        self.demand_driven = demand_driven
+        self.match_size = match_size
+        # Files deliver frames as fast as we grab them; live cameras pace themselves.
+        # `replay_speed` only speeds up file playback, never the rate asked of a live camera.
+        self.paced_source = isinstance(src, str) and os.path.isfile(src)
+        self.replay_speed = replay_speed if replay_speed > 0 else 1.0
+        self.cap = capture if capture is not None else cv2.VideoCapture(self.src)
         self.frame = None
+        self.frame_time = 0.0 # Grab time of self.frame
+        self.read_frame_time = 0.0 # Grab time of the frame last returned by read()
+        self.frame_count = 0 # Incremented for every new (decoded) frame, lets consumers skip duplicates
+        self.grabbed_frames = 0
         self.lock = threading.Lock()
         self.user_requested_stop = False # True if stop() has been called by the user
-        
+        # Demand tracking: decode only once the consumer has taken the previous frame and is due back
+        self.decode_requested = True
+        self.consumer_waiting = False # The consumer came back before a new frame was decoded
+        self.last_read_count = 0 # frame_count handed out by the last read()
+        self.last_read_time = 0.0
+        self.read_interval = 0.0 # EWMA of time between consumer reads
+        self.grab_interval = 1.0 / self.fps # EWMA of time between grabs
+        self.last_grab_time = 0.0
+
         if self.cap.isOpened():
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-            self.cap.set(cv2.CAP_PROP_FPS, self.fps if self.fps > 0 else 30) # Pass a valid FPS to OpenCV
+            self._configure_capture()
             self.stopped = False # Indicates current operational status
             print(f"[Camera {self.src}] Initialized and opened successfully.")
         else:
@@ -33,6 +78,39 @@ class CameraStream:
         print(f"[Camera {self.src}] Update thread started.")
         return self
 
+    def _configure_capture(self):
+        if self.match_size:
+            self.width, self.height = self._pick_capture_size(*self.match_size)
+        else:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps if self.fps > 0 else 30) # Pass a valid FPS to OpenCV
+
+    def _pick_capture_size(self, target_width, target_height):
+        """Asks the driver for each candidate size and keeps the first one it accepts exactly."""
+        for width, height in closest_capture_sizes(target_width, target_height):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            actual = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            if actual == (width, height):
+                print(f"[Camera {self.src}] Capturing at {width}x{height}, closest to model input {target_width}x{target_height}.")
+                return actual
+        # No candidate accepted as-is (or a file source): keep whatever the driver reports
+        actual = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        print(f"[Camera {self.src}] No exact mode near {target_width}x{target_height}; capturing at {actual[0]}x{actual[1]}.")
+        return actual
+
+    def _should_decode(self, now):
+        if not self.demand_driven or self.last_read_time == 0.0:
+            return True
+        if not self.decode_requested:
+            return False # The consumer has not taken the last decoded frame yet
+        if self.consumer_waiting:
+            return True # Back earlier than predicted: decode this grab right away
+        # Decode the last grab before the consumer is expected back (with half a frame of margin),
+        # not every grab in between
+        return now + 1.5 * self.grab_interval >= self.last_read_time + self.read_interval
+
     def update(self):
         connection_retry_interval_seconds = 2.0
         last_connection_attempt_time = 0
@@ -47,9 +125,7 @@ class CameraStream:
 
                     if self.cap.isOpened():
                         print(f"[Camera {self.src}] Reconnected successfully.")
-                        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-                        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-                        self.cap.set(cv2.CAP_PROP_FPS, self.fps if self.fps > 0 else 30)
+                        self._configure_capture()
                         self.stopped = False # Now operational
                     else:
                         # print(f"[Camera {self.src}] Connection attempt failed. Retrying later.")
@@ -65,7 +141,8 @@ class CameraStream:
                 time.sleep(0.1) # Brief pause
                 continue
 
-            ret, frame_read = self.cap.read()
+            grab_start = time.time()
+            ret = self.capture_once()
 
             if not ret:
                 if not self.user_requested_stop: # Avoid error message if we are stopping
@@ -80,10 +157,8 @@ class CameraStream:
                 print(f"[Camera {self.src}] Resumed streaming successfully.")
                 self.stopped = False # Mark as operational
 
-            with self.lock:
-                self.frame = frame_read.copy()
-            
-            time.sleep(1.0 / self.fps)
+            if self.paced_source:
+                time.sleep(max(0.0, 1.0 / (self.fps * self.replay_speed) - (time.time() - grab_start)))
 
         # Exiting thread
         if self.cap.isOpened():
@@ -91,13 +166,58 @@ class CameraStream:
         print(f"[Camera {self.src}] Update thread stopped.")
 
 
+    def capture_once(self):
+        """Grabs one frame and decodes it if the consumer will want it. Returns False if the grab failed."""
+        if not self.cap.grab(): # Cheap: dequeues the frame without decoding it
+            return False
+        now = time.time()
+        if self.last_grab_time:
+            self.grab_interval = 0.9 * self.grab_interval + 0.1 * (now - self.last_grab_time)
+        self.last_grab_time = now
+        with self.lock:
+            self.grabbed_frames += 1
+            decode = self._should_decode(now)
+
+        if decode:
+            ret, frame_read = self.cap.retrieve()
+            if ret:
+                with self.lock:
+                    self.frame = frame_read # retrieve() returns a fresh array; no copy needed
+                    self.frame_time = now
+                    self.frame_count += 1
+                    self.decode_requested = False
+                    self.consumer_waiting = False
+        return True
+
     def read(self):
         if self.stopped or self.frame is None: # If camera claims to be stopped or no frame yet
             return None
         with self.lock:
+            if self.frame_count == self.last_read_count:
+                # Nothing decoded since the last read; the capture thread decodes its next grab
+                self.consumer_waiting = True
+                return None
+            now = time.time()
+            if self.last_read_time:
+                self.read_interval = 0.8 * self.read_interval + 0.2 * (now - self.last_read_time)
+            self.last_read_time = now
+            self.last_read_count = self.frame_count
+            self.read_frame_time = self.frame_time
+            self.decode_requested = True # Ask the capture thread to decode a fresh frame for next time
             # Make a copy to prevent issues if the frame is updated by the thread immediately after
             return self.frame.copy() if self.frame is not None else None
 
+    def capture_stats(self):
+        """Frames grabbed from the driver vs. decoded for consumers since start."""
+        with self.lock:
+            grabbed, decoded = self.grabbed_frames, self.frame_count
+        return {
+            'grabbed': grabbed,
+            'decoded': decoded,
+            'decodes_saved': grabbed - decoded,
+            'saved_ratio': (grabbed - decoded) / grabbed if grabbed else 0.0
+        }
+
     def stop(self):
         print(f"[Camera {self.src}] Stop requested.")
         self.user_requested_stop = True # Signal thread to exit
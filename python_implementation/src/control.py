@@ -0,0 +1,99 @@
+import json
+import queue
+import time
+from concurrent.futures import Future
+
+TOPIC_CONTROL = "smart_office/edge/control"
+TOPIC_CONTROL_ACK = "smart_office/edge/control/ack"
+
+
+class ControlPlane:
+    """Applies runtime configuration commands received on TOPIC_CONTROL.
+
+    A command is a JSON object such as `{"id": "42", "command": "set_threshold", "value": 0.6}`.
+    Commands arrive on paho's network thread and are queued; the main loop calls
+    `apply_pending()` once per iteration, so every change lands between frames and the
+    loop state never needs a lock. Each command is acknowledged on TOPIC_CONTROL_ACK
+    with its outcome and latency (receipt to applied).
+
+    Handlers are called as `handler(**params)` and return a short description of what
+    changed, or raise to reject the command; any exception is nacked with its message
+    rather than propagated, so a bad command can never stop the main loop. Slow work
+    (opening a camera) can instead return a Future from an executor; its result must be
+    a callable that finishes the change on the main loop and returns the description.
+    """
+
+    def __init__(self, mqtt_client, max_pending=32):
+        self.mqtt_client = mqtt_client
+        self.handlers = {}
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.in_flight = [] # (future, request, received time)
+
+    def register(self, command, handler):
+        self.handlers[command] = handler
+
+    def start(self):
+        self.mqtt_client.subscribe(TOPIC_CONTROL, self.on_message, qos=1)
+        print(f"[Control] Listening for commands on {TOPIC_CONTROL}: {', '.join(sorted(self.handlers))}")
+        return self
+
+    def on_message(self, topic, payload):
+        received = time.time()
+        try:
+            request = json.loads(payload.decode())
+            if not isinstance(request, dict) or not isinstance(request.get('command'), str):
+                raise ValueError("expected a JSON object with a 'command' string")
+        except (ValueError, AttributeError) as e:
+            self._ack({}, False, f"malformed command: {e}", received)
+            return
+        try:
+            self.pending.put_nowait((request, received))
+        except queue.Full:
+            self._ack(request, False, "control queue full, command dropped", received)
+
+    def apply_pending(self):
+        """Applies queued commands and finishes completed asynchronous ones. Main loop only."""
+        if self.in_flight:
+            still_running = []
+            for future, request, received in self.in_flight:
+                if not future.done():
+                    still_running.append((future, request, received))
+                    continue
+                try:
+                    finish = future.result()
+                    self._ack(request, True, finish(), received)
+                except Exception as e: # Includes cv2.error from opening a bad source
+                    self._ack(request, False, f"{type(e).__name__}: {e}", received)
+            self.in_flight = still_running
+
+        while True:
+            try:
+                request, received = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            handler = self.handlers.get(request['command'])
+            if handler is None:
+                self._ack(request, False, f"unknown command (known: {', '.join(sorted(self.handlers))})", received)
+                continue
+            params = {k: v for k, v in request.items() if k not in ('id', 'command')}
+            try:
+                result = handler(**params)
+            except Exception as e:
+                self._ack(request, False, f"{type(e).__name__}: {e}", received)
+                continue
+            if isinstance(result, Future):
+                self.in_flight.append((result, request, received))
+            else:
+                self._ack(request, True, result, received)
+
+    def _ack(self, request, ok, detail, received):
+        latency_ms = (time.time() - received) * 1000
+        command = request.get('command')
+        print(f"[Control] {command} {'applied' if ok else 'rejected'} after {latency_ms:.1f}ms: {detail}")
+        self.mqtt_client.publish(TOPIC_CONTROL_ACK, {
+            "id": request.get('id'),
+            "command": command,
+            "ok": ok,
+            "detail": detail,
+            "latency_ms": round(latency_ms, 2)
+        }, qos=1)
@@ -0,0 +1,110 @@
+import time
+import numpy as np
+import cv2
+from multiprocessing import shared_memory
+
+# Header layout (int64): [latest_seq, camera_active, slot0_seq, slot0_h, slot0_w, slot1_seq, ...]
+_HEADER_FIELDS = 2
+_SLOT_FIELDS = 3
+
+
+class SharedFrameRing:
+    """Fixed-size ring of BGR frames in `multiprocessing.shared_memory`.
+
+    One writer process (capture) puts frames, any number of reader processes fetch them
+    by sequence number. Only the sequence number needs to cross process boundaries;
+    the pixels stay in shared memory. A slot's sequence number is cleared while it is
+    being written, so readers detect frames that were overwritten mid-copy and skip them.
+    """
+
+    def __init__(self, name=None, slots=8, width=640, height=480, create=False):
+        self.slots = slots
+        self.width = width
+        self.height = height
+        header_bytes = (_HEADER_FIELDS + _SLOT_FIELDS * slots) * 8
+        ts_bytes = slots * 8
+        frame_bytes = slots * height * width * 3
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=header_bytes + ts_bytes + frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.owner = create
+
+        self.header = np.ndarray((_HEADER_FIELDS + _SLOT_FIELDS * slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.timestamps = np.ndarray((slots,), dtype=np.float64, buffer=self.shm.buf, offset=header_bytes)
+        self.frames = np.ndarray((slots, height, width, 3), dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=header_bytes + ts_bytes)
+        if create:
+            self.header[:] = 0
+            self.timestamps[:] = 0.0
+
+    def spec(self):
+        """Arguments needed to attach to this ring from another process."""
+        return {'name': self.name, 'slots': self.slots, 'width': self.width, 'height': self.height}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['name'], spec['slots'], spec['width'], spec['height'], create=False)
+
+    @property
+    def latest_seq(self):
+        return int(self.header[0])
+
+    @property
+    def active(self):
+        return bool(self.header[1])
+
+    def set_active(self, active):
+        self.header[1] = 1 if active else 0
+
+    def write(self, frame):
+        """Copies `frame` into the next slot and returns its sequence number."""
+        h, w = frame.shape[:2]
+        if h > self.height or w > self.width:
+            # Slots are sized for the configured capture resolution; shrink anything larger
+            scale = min(self.width / w, self.height / h)
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
+            h, w = frame.shape[:2]
+
+        seq = self.latest_seq + 1
+        slot = seq % self.slots
+        base = _HEADER_FIELDS + _SLOT_FIELDS * slot
+        self.header[base] = 0 # Mark slot as being written
+        self.frames[slot, :h, :w] = frame
+        self.header[base + 1] = h
+        self.header[base + 2] = w
+        self.timestamps[slot] = time.time()
+        self.header[base] = seq
+        self.header[0] = seq
+        return seq
+
+    def read(self, seq):
+        """Returns (frame_copy, timestamp) for `seq`, or (None, 0.0) if it was overwritten."""
+        if seq <= 0:
+            return None, 0.0
+        slot = seq % self.slots
+        base = _HEADER_FIELDS + _SLOT_FIELDS * slot
+        if self.header[base] != seq:
+            return None, 0.0
+        h, w = int(self.header[base + 1]), int(self.header[base + 2])
+        frame = self.frames[slot, :h, :w].copy()
+        timestamp = float(self.timestamps[slot])
+        if self.header[base] != seq: # Writer lapped us during the copy
+            return None, 0.0
+        return frame, timestamp
+
+    def read_latest(self):
+        seq = self.latest_seq
+        frame, timestamp = self.read(seq)
+        return seq, frame, timestamp
+
+    def close(self):
+        # Drop numpy views before closing, otherwise the buffer is still exported
+        self.header = self.timestamps = self.frames = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
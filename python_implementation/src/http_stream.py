@@ -0,0 +1,172 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOUNDARY = "frame"
+
+
+class FrameSlot:
+    """Latest encoded JPEG for one camera, shared by every connected client.
+
+    Clients wait for a newer sequence number and always take the most recent frame,
+    so a slow client skips frames instead of building up a backlog.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.timestamp = 0.0
+        self.clients = 0
+
+    def put(self, jpeg_bytes):
+        with self.condition:
+            self.jpeg = jpeg_bytes
+            self.seq += 1
+            self.timestamp = time.time()
+            self.condition.notify_all()
+
+    def wait_newer(self, last_seq, timeout=1.0):
+        with self.condition:
+            if self.seq <= last_seq:
+                self.condition.wait(timeout)
+            return self.seq, self.jpeg
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    # Set on the per-server subclass created in MJPEGServer.start()
+    stream_server = None
+
+    def log_message(self, format, *args):
+        pass # Keep the console quiet; connects/disconnects are logged explicitly
+
+    def do_GET(self):
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if not parts:
+            self._send_index()
+        elif len(parts) == 3 and parts[0] == 'camera' and parts[2] in ('stream', 'snapshot'):
+            slot = self.stream_server.slots.get(parts[1])
+            if slot is None:
+                self.send_error(404, f"Unknown camera {parts[1]}")
+            elif parts[2] == 'stream':
+                self._send_stream(parts[1], slot)
+            else:
+                self._send_snapshot(slot)
+        else:
+            self.send_error(404)
+
+    def _send_index(self):
+        links = "".join(
+            f'<li>Camera {cam_id}: <a href="/camera/{cam_id}/stream">stream</a> | '
+            f'<a href="/camera/{cam_id}/snapshot">snapshot</a></li>'
+            for cam_id in sorted(self.stream_server.slots)
+        )
+        body = f"<html><body><h1>Smart Office Cameras</h1><ul>{links}</ul></body></html>".encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_snapshot(self, slot):
+        # Count as a client while waiting so the edge node starts encoding this camera again
+        with slot.condition:
+            slot.clients += 1
+            last_seq = slot.seq
+        try:
+            _, jpeg = slot.wait_newer(last_seq, timeout=2.0)
+        finally:
+            with slot.condition:
+                slot.clients -= 1
+        if jpeg is None:
+            self.send_error(503, "No frame available yet")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(jpeg)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(jpeg)
+
+    def _send_stream(self, cam_id, slot):
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        with slot.condition:
+            slot.clients += 1
+        print(f"[HTTP] Client {self.client_address[0]} connected to camera {cam_id} stream.")
+        last_seq = 0
+        try:
+            while not self.stream_server.stopped and self.stream_server.slots.get(cam_id) is slot:
+                seq, jpeg = slot.wait_newer(last_seq)
+                if jpeg is None or seq == last_seq:
+                    continue
+                last_seq = seq
+                # The same bytes object is written to every client; no per-client encoding
+                self.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with slot.condition:
+                slot.clients -= 1
+            print(f"[HTTP] Client {self.client_address[0]} disconnected from camera {cam_id} stream.")
+
+
+class MJPEGServer:
+    """Optional HTTP server that serves already-encoded camera frames as MJPEG.
+
+    Endpoints: `/camera/<id>/stream` (multipart/x-mixed-replace) and `/camera/<id>/snapshot`.
+    """
+
+    def __init__(self, camera_ids, host='0.0.0.0', port=8080):
+        self.host = host
+        self.port = port
+        self.slots = {str(cam_id): FrameSlot() for cam_id in camera_ids}
+        self.stopped = True
+        self.httpd = None
+        self._thread = None
+
+    def start(self):
+        handler = type('StreamHandler', (_StreamHandler,), {'stream_server': self})
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        except OSError as e:
+            print(f"[HTTP] Failed to start MJPEG server on {self.host}:{self.port}: {e}")
+            return self
+        self.httpd.daemon_threads = True
+        self.stopped = False
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"[HTTP] MJPEG server listening on http://{self.host}:{self.port}/")
+        return self
+
+    def add_camera(self, cam_id):
+        self.slots.setdefault(str(cam_id), FrameSlot())
+
+    def remove_camera(self, cam_id):
+        # Connected stream clients notice the slot is gone and end their response
+        self.slots.pop(str(cam_id), None)
+
+    def update_frame(self, cam_id, jpeg_bytes):
+        slot = self.slots.get(str(cam_id))
+        if slot is not None:
+            slot.put(jpeg_bytes)
+
+    def client_count(self, cam_id):
+        slot = self.slots.get(str(cam_id))
+        return slot.clients if slot is not None else 0
+
+    def stop(self):
+        if self.httpd is None:
+            return
+        self.stopped = True
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        print("[HTTP] MJPEG server stopped.")
@@ -2,17 +2,73 @@ import numpy as np
 import cv2
 import time
 import os
-try:
-    from pycoral.utils.edgetpu import make_interpreter
-    from pycoral.adapters.common import input_size
-    from pycoral.adapters.detect import get_objects
-    TPU_AVAILABLE = True
-except ImportError as e:
-    print(f"[WARN] TPU import failed: {e}")
-    TPU_AVAILABLE = False
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# pycoral is imported on first use (see _load_pycoral) so that importing this module stays cheap
+TPU_AVAILABLE = None
+make_interpreter = None
+get_objects = None
+
+
+def _load_pycoral():
+    global TPU_AVAILABLE, make_interpreter, get_objects
+    if TPU_AVAILABLE is None:
+        try:
+            from pycoral.utils.edgetpu import make_interpreter as _make_interpreter
+            from pycoral.adapters.detect import get_objects as _get_objects
+            make_interpreter, get_objects = _make_interpreter, _get_objects
+            TPU_AVAILABLE = True
+        except ImportError as e:
+            print(f"[WARN] TPU import failed: {e}")
+            TPU_AVAILABLE = False
+    return TPU_AVAILABLE
+
+
+def _tflite_interpreter_class():
+    """Returns the CPU TFLite Interpreter class (tflite_runtime, else tensorflow.lite), or None."""
+    try:
+        from tflite_runtime.interpreter import Interpreter as TfliteInterpreter
+        print("[INFO] Using tflite_runtime Interpreter for CPU")
+        return TfliteInterpreter
+    except ImportError:
+        try:
+            from tensorflow.lite import Interpreter as TfLiteInterpreter
+            print("[INFO] Using tensorflow.lite Interpreter for CPU")
+            return TfLiteInterpreter
+        except ImportError as e:
+            print(f"[ERROR] No TFLite runtime found for CPU interpreter: {e}")
+    return None
+
+
+def _dequantized_output(interpreter, detail):
+    """Reads an output tensor as float, applying its quantization parameters if any."""
+    tensor = interpreter.get_tensor(detail['index'])
+    scale, zero_point = detail.get('quantization', (0.0, 0))
+    if scale:
+        return (tensor.astype(np.float32) - zero_point) * scale
+    return tensor.astype(np.float32)
+
+
+class InterpreterSlot:
+    """One loaded interpreter in the PersonDetector pool, with its usage counters."""
+
+    def __init__(self, kind, name, interpreter):
+        self.kind = kind # 'TPU' or 'CPU'
+        self.name = name
+        self.interpreter = interpreter
+        self.failed = False
+        self.invokes = 0
+        self.busy_time = 0.0
+
 
 class PersonDetector:
-    def __init__(self, model_path_tpu, model_path_cpu, threshold=0.5, label_path='models/coco_labels.txt'):
+    def __init__(self, model_path_tpu, model_path_cpu, threshold=0.5, label_path='models/coco_labels.txt',
+                 cascade_model=None, cascade_type='detector', cascade_threshold=0.3, cascade_person_index=None,
+                 cascade_region_margin=0.15, cascade_hold_frames=5,
+                 tpu_devices=None, cpu_interpreters=1, cpu_threads=None,
+                 tile_grid=None, tile_overlap=0.2, tile_include_full=True, nms_iou_threshold=0.5,
+                 tile_containment_threshold=0.8):
         # Resolve model & label paths relative to project root
         base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
         self.model_path_tpu = model_path_tpu if os.path.isabs(model_path_tpu) else os.path.join(base_dir, model_path_tpu)
@@ -21,49 +77,205 @@ class PersonDetector:
         self.label_path = label_path if os.path.isabs(label_path) else os.path.join(base_dir, label_path)
         self.labels = self._load_labels(self.label_path)
         self.tpu_failed = False
+        # Interpreter pool: one interpreter per Edge TPU device (e.g. ':0', ':1'; None = pycoral default)
+        # plus `cpu_interpreters` CPU interpreters with `cpu_threads` threads each. An empty
+        # `tpu_devices` list means no TPU at all (CPU only).
+        self.tpu_devices = [None] if tpu_devices is None else list(tpu_devices)
+        self.cpu_interpreters = max(1, cpu_interpreters)
+        self.cpu_threads = cpu_threads
         self._init_interpreters()
         if self.interpreter_tpu is None and self.interpreter_cpu is None:
             raise RuntimeError("No valid interpreter (TPU/CPU) available. Check model paths and runtime deps.")
 
+        # Optional first stage: a cheap model screens every frame and the full model only
+        # runs on frames (detector: regions) it flags. 'classifier' models give one
+        # person/no-person score per frame; 'detector' models are SSD-style like the CPU model.
+        # `cascade_person_index` is the person class id (detector, default 0) or the person
+        # score's position in the classifier output (default 1 for [not_person, person], 0 for
+        # a single sigmoid output).
+        self.cascade_type = cascade_type
+        self.cascade_threshold = cascade_threshold
+        self.cascade_person_index = cascade_person_index
+        self.cascade_region_margin = cascade_region_margin
+        self.cascade_hold_frames = cascade_hold_frames
+        self.hold_frames_left = {} # cam_id -> frames the full model keeps running after a positive
+        self.interpreter_stage1 = None
+        # detect() runs concurrently from the pool's callers: the single stage-1 interpreter
+        # and the shared counters/holds each need their own lock
+        self.stage1_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        if cascade_model:
+            self.cascade_model_path = cascade_model if os.path.isabs(cascade_model) else os.path.join(base_dir, cascade_model)
+            self._init_stage1_interpreter()
+        self.stage_stats = {
+            'frames': 0,
+            'stage1_invokes': 0, 'stage1_time': 0.0,
+            'stage2_invokes': 0, 'stage2_time': 0.0,
+            'stage2_region_invokes': 0,
+            'skipped': 0
+        }
+
+        # Optional tiled mode for high-resolution cameras: the frame is cut into a
+        # (cols, rows) grid of overlapping tiles, each run at model resolution, and the
+        # results are merged with NMS in frame coordinates.
+        self.tile_grid = tuple(tile_grid) if tile_grid else None
+        self.tile_overlap = tile_overlap
+        self.tile_include_full = tile_include_full
+        self.nms_iou_threshold = nms_iou_threshold
+        self.tile_containment_threshold = tile_containment_threshold # Only between boxes of different tiles
+        self._tile_cache = {} # frame shape -> tile boxes
+        self.tile_executor = None
+        if self.tile_grid and self.pool_size > 1:
+            self.tile_executor = ThreadPoolExecutor(max_workers=self.pool_size)
+        self.tile_stats = {'frames': 0, 'tiles': 0, 'time': 0.0, 'merged_away': 0}
+
     def _init_interpreters(self):
-        self.interpreter_tpu = None
-        self.interpreter_cpu = None
-        if TPU_AVAILABLE:
+        # All models load independently, so load them at once
+        jobs = [(self._init_tpu_interpreter, device) for device in self.tpu_devices]
+        jobs += [(self._init_cpu_interpreter, i) for i in range(self.cpu_interpreters)]
+        if not self.tpu_devices:
+            print("[INFO] No Edge TPU assigned; running on CPU interpreters only.")
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = [pool.submit(fn, arg) for fn, arg in jobs]
+            self.slots = [f.result() for f in futures if f.result() is not None]
+
+        self.pool_condition = threading.Condition()
+        self.free_slots = list(self.slots)
+        self.pool_stats_start = time.time()
+        # First interpreter of each kind, kept for callers that expect a single TPU/CPU interpreter
+        self.interpreter_tpu = next((slot.interpreter for slot in self.slots if slot.kind == 'TPU'), None)
+        self.interpreter_cpu = next((slot.interpreter for slot in self.slots if slot.kind == 'CPU'), None)
+        self.tpu_failed = self.interpreter_tpu is None
+
+        # Fatal if neither interpreter is available
+        if self.interpreter_tpu is None and self.interpreter_cpu is None:
+            print("[FATAL] No valid interpreter available! Check your model files and runtime dependencies.")
+
+    def _init_tpu_interpreter(self, device):
+        if _load_pycoral():
+            name = f"TPU{device}" if device else "TPU"
             try:
-                self.interpreter_tpu = make_interpreter(self.model_path_tpu)
-                self.interpreter_tpu.allocate_tensors()
-                print("[INFO] TPU interpreter loaded successfully.")
+                if device:
+                    interpreter = make_interpreter(self.model_path_tpu, device=device)
+                else:
+                    interpreter = make_interpreter(self.model_path_tpu)
+                interpreter.allocate_tensors()
+                print(f"[INFO] {name} interpreter loaded successfully.")
+                return InterpreterSlot('TPU', name, interpreter)
             except Exception as e:
-                print(f"[ERROR] Failed to load TPU interpreter: {e}")
-                self.tpu_failed = True
+                print(f"[ERROR] Failed to load {name} interpreter: {e}")
+        return None
 
+    def _init_cpu_interpreter(self, index):
         # CPU interpreter init with fallback to tflite_runtime or tensorflow.lite
-        Interpreter = None
-        try:
-            from tflite_runtime.interpreter import Interpreter as TfliteInterpreter
-            Interpreter = TfliteInterpreter
-            print("[INFO] Using tflite_runtime Interpreter for CPU")
-        except ImportError:
-            try:
-                from tensorflow.lite import Interpreter as TfLiteInterpreter
-                Interpreter = TfLiteInterpreter
-                print("[INFO] Using tensorflow.lite Interpreter for CPU")
-            except ImportError as e:
-                print(f"[ERROR] No TFLite runtime found for CPU interpreter: {e}")
+        Interpreter = _tflite_interpreter_class()
         if Interpreter:
+            name = f"CPU{index}"
             try:
-                self.interpreter_cpu = Interpreter(model_path=self.model_path_cpu)
-                self.interpreter_cpu.allocate_tensors()
-                print("[INFO] CPU interpreter loaded successfully.")
+                if self.cpu_threads:
+                    interpreter = Interpreter(model_path=self.model_path_cpu, num_threads=self.cpu_threads)
+                else:
+                    interpreter = Interpreter(model_path=self.model_path_cpu)
+                interpreter.allocate_tensors()
+                print(f"[INFO] {name} interpreter loaded successfully.")
+                return InterpreterSlot('CPU', name, interpreter)
             except Exception as e:
-                print(f"[ERROR] Failed to load CPU interpreter: {e}")
-                self.interpreter_cpu = None
-        else:
-            self.interpreter_cpu = None
+                print(f"[ERROR] Failed to load {name} interpreter: {e}")
+        return None
 
-        # Fatal if neither interpreter is available
-        if self.interpreter_tpu is None and self.interpreter_cpu is None:
-            print("[FATAL] No valid interpreter available! Check your model files and runtime dependencies.")
+    @property
+    def pool_size(self):
+        """Number of healthy interpreters that can run detections concurrently."""
+        return sum(1 for slot in self.slots if not slot.failed)
+
+    def _acquire_slot(self):
+        """Blocks until an interpreter is free, preferring TPUs. Returns None if none are usable."""
+        with self.pool_condition:
+            while True:
+                if not any(not slot.failed for slot in self.slots):
+                    return None
+                for kind in ('TPU', 'CPU'):
+                    for slot in self.free_slots:
+                        if slot.kind == kind and not slot.failed:
+                            self.free_slots.remove(slot)
+                            return slot
+                self.pool_condition.wait()
+
+    def _release_slot(self, slot, busy_time):
+        with self.pool_condition: # Counters are updated here so pool_stats() never reads them mid-update
+            slot.invokes += 1
+            slot.busy_time += busy_time
+            self.free_slots.append(slot)
+            self.pool_condition.notify()
+
+    def pool_stats(self):
+        """Per-interpreter invokes and utilization (busy fraction) since the last call."""
+        with self.pool_condition:
+            now = time.time()
+            elapsed = max(now - self.pool_stats_start, 1e-6)
+            stats = []
+            for slot in self.slots:
+                stats.append({
+                    'name': slot.name,
+                    'invokes': slot.invokes,
+                    'avg_ms': slot.busy_time / slot.invokes * 1000.0 if slot.invokes else 0.0,
+                    'utilization': min(1.0, slot.busy_time / elapsed),
+                    'failed': slot.failed
+                })
+                slot.invokes = 0
+                slot.busy_time = 0.0
+            self.pool_stats_start = now
+        return stats
+
+    def _init_stage1_interpreter(self):
+        try:
+            if self.cascade_model_path.endswith('_edgetpu.tflite') and _load_pycoral():
+                self.interpreter_stage1 = make_interpreter(self.cascade_model_path)
+            else:
+                Interpreter = _tflite_interpreter_class()
+                if Interpreter is None:
+                    return
+                self.interpreter_stage1 = Interpreter(model_path=self.cascade_model_path)
+            self.interpreter_stage1.allocate_tensors()
+            _, in_h, in_w, _ = self.interpreter_stage1.get_input_details()[0]['shape']
+            self.stage1_input_size = (int(in_w), int(in_h))
+            if self.cascade_type == 'classifier':
+                classes = int(np.prod(self.interpreter_stage1.get_output_details()[0]['shape']))
+                if self.cascade_person_index is None:
+                    self.cascade_person_index = 1 if classes > 1 else 0
+                if not 0 <= self.cascade_person_index < classes:
+                    raise ValueError(f"person index {self.cascade_person_index} is outside the {classes} classifier outputs")
+            elif self.cascade_person_index is None:
+                self.cascade_person_index = 0 # COCO person class
+            print(f"[INFO] Cascade first stage ({self.cascade_type}, {in_w}x{in_h}, person index "
+                  f"{self.cascade_person_index}) loaded successfully.")
+        except Exception as e:
+            print(f"[ERROR] Failed to load cascade first stage, running full model on every frame: {e}")
+            self.interpreter_stage1 = None
+
+    def warm_up(self):
+        """Runs one dummy invoke on each loaded interpreter so the first real frame is not slow."""
+        dummy = np.zeros((1, 480, 480, 3), dtype=np.uint8)
+        targets = [(slot.name, slot.interpreter) for slot in self.slots]
+        targets.append(('Cascade', self.interpreter_stage1))
+        for name, interpreter in targets:
+            if interpreter is None:
+                continue
+            start = time.time()
+            try:
+                if name == 'Cascade':
+                    w, h = self.stage1_input_size
+                    dummy = np.zeros((1, h, w, 3), dtype=interpreter.get_input_details()[0]['dtype'])
+                interpreter.set_tensor(interpreter.get_input_details()[0]['index'], dummy)
+                interpreter.invoke()
+                print(f"[INFO] {name} interpreter warm-up took {(time.time() - start) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"[WARN] {name} interpreter warm-up failed: {e}")
+                for slot in self.slots:
+                    if slot.name == name and slot.kind == 'TPU':
+                        slot.failed = True
+                self.tpu_failed = not any(slot.kind == 'TPU' and not slot.failed for slot in self.slots)
+        return self
 
     def _load_labels(self, path):
         labels = {}
@@ -75,7 +287,177 @@ class PersonDetector:
             pass
         return labels
 
-    def detect(self, frame):
+    def detect(self, frame, cam_id=None):
+        """Person detections for one frame. `cam_id` keys the cascade hold, so one camera's
+        positive never skips screening (or uses up the hold) on another camera."""
+        if self.interpreter_stage1 is None:
+            return self._detect_stage2(frame)
+
+        with self.stats_lock:
+            self.stage_stats['frames'] += 1
+            held = self.hold_frames_left.get(cam_id, 0) > 0
+            if held:
+                # A person was just confirmed on this camera; skip screening so tracking does not flicker
+                self.hold_frames_left[cam_id] -= 1
+        region = None
+        if not held:
+            is_candidate, region = self._screen(frame)
+            if not is_candidate:
+                with self.stats_lock:
+                    self.stage_stats['skipped'] += 1
+                return [], 'CASCADE'
+
+        start = time.time()
+        if region is not None:
+            x0, y0, x1, y1 = region
+            detections, engine = self._detect_full(frame[y0:y1, x0:x1])
+            detections = to_detection_dicts(detections, (y1 - y0, x1 - x0))
+            for det in detections:
+                det['bbox'][0] += x0
+                det['bbox'][1] += y0
+        else:
+            detections, engine = self._detect_stage2(frame)
+        with self.stats_lock:
+            if region is not None:
+                self.stage_stats['stage2_region_invokes'] += 1
+            self.stage_stats['stage2_invokes'] += 1
+            self.stage_stats['stage2_time'] += time.time() - start
+            if detections:
+                self.hold_frames_left[cam_id] = self.cascade_hold_frames
+        return detections, engine
+
+    def _screen(self, frame):
+        """First stage. Returns (is_candidate, region) where region is (x0, y0, x1, y1) or None for the whole frame."""
+        start = time.time()
+        interpreter = self.interpreter_stage1
+        input_detail = interpreter.get_input_details()[0]
+        input_data = np.expand_dims(cv2.resize(frame, self.stage1_input_size), axis=0)
+        if input_detail['dtype'] == np.float32:
+            input_data = (input_data.astype(np.float32) - 127.5) / 127.5 # Float models expect [-1, 1]
+        else:
+            input_data = input_data.astype(input_detail['dtype'])
+        with self.stage1_lock: # One interpreter shared by all callers; TFLite is not thread-safe
+            interpreter.set_tensor(input_detail['index'], input_data)
+            interpreter.invoke()
+            output_details = interpreter.get_output_details()
+            outputs = [_dequantized_output(interpreter, detail) for detail in output_details[:3]]
+
+        is_candidate, region = False, None
+        if self.cascade_type == 'classifier':
+            probs = outputs[0].reshape(-1)
+            is_candidate = probs[self.cascade_person_index] >= self.cascade_threshold
+        else:
+            boxes, classes, scores = (output[0] for output in outputs)
+            mask = (classes.astype(int) == self.cascade_person_index) & (scores >= self.cascade_threshold)
+            if mask.any():
+                is_candidate = True
+                # Union of candidate boxes (ymin, xmin, ymax, xmax normalized), padded by the margin
+                ymin, xmin = boxes[mask, 0].min(), boxes[mask, 1].min()
+                ymax, xmax = boxes[mask, 2].max(), boxes[mask, 3].max()
+                margin = self.cascade_region_margin
+                h, w = frame.shape[:2]
+                x0, y0 = int(max(0.0, xmin - margin) * w), int(max(0.0, ymin - margin) * h)
+                x1, y1 = int(min(1.0, xmax + margin) * w), int(min(1.0, ymax + margin) * h)
+                # Only crop when it saves real work; tiny crops lose too much context
+                if (x1 - x0) * (y1 - y0) < 0.5 * w * h and x1 - x0 > 32 and y1 - y0 > 32:
+                    region = (x0, y0, x1, y1)
+        with self.stats_lock:
+            self.stage_stats['stage1_invokes'] += 1
+            self.stage_stats['stage1_time'] += time.time() - start
+        return is_candidate, region
+
+    def cascade_stats(self):
+        """Per-stage invoke counts and mean times (ms) since the last call; None without a cascade."""
+        if self.interpreter_stage1 is None:
+            return None
+        with self.stats_lock:
+            stats = dict(self.stage_stats)
+            for key in self.stage_stats:
+                self.stage_stats[key] = 0 if isinstance(self.stage_stats[key], int) else 0.0
+        stats['stage1_ms'] = stats['stage1_time'] / stats['stage1_invokes'] * 1000.0 if stats['stage1_invokes'] else 0.0
+        stats['stage2_ms'] = stats['stage2_time'] / stats['stage2_invokes'] * 1000.0 if stats['stage2_invokes'] else 0.0
+        return stats
+
+    def _detect_stage2(self, frame):
+        if self.tile_grid:
+            return self._detect_tiled(frame)
+        return self._detect_full(frame)
+
+    def _tile_boxes(self, frame_shape):
+        """(x0, y0, x1, y1) for each tile of the configured grid, cached per frame size."""
+        h, w = frame_shape[:2]
+        boxes = self._tile_cache.get((h, w))
+        if boxes is None:
+            cols, rows = self.tile_grid
+            overlap = self.tile_overlap
+            tile_w = w / (cols - (cols - 1) * overlap)
+            tile_h = h / (rows - (rows - 1) * overlap)
+            boxes = []
+            for r in range(rows):
+                for c in range(cols):
+                    x0 = int(round(c * tile_w * (1 - overlap)))
+                    y0 = int(round(r * tile_h * (1 - overlap)))
+                    boxes.append((x0, y0, min(w, int(round(x0 + tile_w))), min(h, int(round(y0 + tile_h)))))
+            if self.tile_include_full:
+                boxes.append((0, 0, w, h)) # Downscaled whole frame still catches people larger than a tile
+            self._tile_cache[(h, w)] = boxes
+        return boxes
+
+    def _detect_tiled(self, frame):
+        start = time.time()
+        boxes = self._tile_boxes(frame.shape)
+
+        def run_tile(i):
+            # Each tile is resized in the worker that runs it, so preprocessing overlaps inference
+            x0, y0, x1, y1 = boxes[i]
+            input_data = np.expand_dims(cv2.resize(frame[y0:y1, x0:x1], (480, 480)), axis=0).astype(np.uint8)
+            return self._infer(input_data, (y1 - y0, x1 - x0))
+
+        # Tiles are independent, so they are spread over the whole interpreter pool
+        if self.tile_executor:
+            results = list(self.tile_executor.map(run_tile, range(len(boxes))))
+        else:
+            results = [run_tile(i) for i in range(len(boxes))]
+
+        merged_boxes, merged_scores, merged_tiles = [], [], []
+        engine = 'NONE'
+        for tile, ((x0, y0, x1, y1), (detections, tile_engine)) in enumerate(zip(boxes, results)):
+            if tile_engine != 'NONE':
+                engine = tile_engine
+            for det in to_detection_dicts(detections, (y1 - y0, x1 - x0)):
+                bx, by, bw, bh = det['bbox']
+                merged_boxes.append((bx + x0, by + y0, bw, bh))
+                merged_scores.append(det['score'])
+                merged_tiles.append(tile)
+
+        detections = []
+        if merged_boxes:
+            boxes_arr = np.array(merged_boxes, dtype=np.float32)
+            scores_arr = np.array(merged_scores, dtype=np.float32)
+            keep = nms(boxes_arr, scores_arr, self.nms_iou_threshold,
+                       containment_threshold=self.tile_containment_threshold, groups=np.array(merged_tiles))
+            detections = [{'bbox': [int(v) for v in merged_boxes[i]], 'score': merged_scores[i]} for i in keep]
+        with self.stats_lock:
+            if merged_boxes:
+                self.tile_stats['merged_away'] += len(merged_boxes) - len(keep)
+            self.tile_stats['frames'] += 1
+            self.tile_stats['tiles'] += len(boxes)
+            self.tile_stats['time'] += time.time() - start
+        return detections, engine
+
+    def tiling_stats(self):
+        """Tiles per frame and mean tiled-frame time (ms) since the last call; None when tiling is off."""
+        if not self.tile_grid:
+            return None
+        with self.stats_lock:
+            stats = self.tile_stats
+            self.tile_stats = {'frames': 0, 'tiles': 0, 'time': 0.0, 'merged_away': 0}
+        frames = stats['frames']
+        stats['tiles_per_frame'] = stats['tiles'] / frames if frames else 0.0
+        stats['frame_ms'] = stats['time'] / frames * 1000.0 if frames else 0.0
+        return stats
+
+    def _detect_full(self, frame):
         # Input frame is BGR from CameraStream
         # Resize to model input size (e.g., 300x300)
         input_frame_resized = cv2.resize(frame, (480, 480))
@@ -92,44 +474,115 @@ class PersonDetector:
         # Add batch dimension: (1, H, W, 3)
         input_data = np.expand_dims(input_frame_reshaped, axis=0)
         input_data = input_data.astype(np.uint8)
+        return self._infer(input_data, frame.shape)
 
-        # Try TPU first
-        if TPU_AVAILABLE and not self.tpu_failed and self.interpreter_tpu:
+    def _infer(self, input_data, frame_shape):
+        # Run on whichever pooled interpreter is free (TPUs first). A failing TPU is taken
+        # out of the pool and the frame is retried, ending on CPU if no TPU is left.
+        while True:
+            slot = self._acquire_slot()
+            if slot is None:
+                return [], 'NONE'
+            start = time.time()
             try:
-                self.interpreter_tpu.set_tensor(self.interpreter_tpu.get_input_details()[0]['index'], input_data)
-                self.interpreter_tpu.invoke()
-                objs = get_objects(self.interpreter_tpu, self.threshold)
-                # Filter for person class only (index 0)
-                filtered = [o for o in objs if hasattr(o, 'id') and o.id == 0]
-                return filtered, 'TPU'
+                if slot.kind == 'TPU':
+                    return self._invoke_tpu(slot.interpreter, input_data), 'TPU'
+                return self._invoke_cpu(slot.interpreter, input_data, frame_shape), 'CPU'
             except Exception as e:
-                print(f"[ERROR][Inference] TPU execution failed: {e}")
-                self.tpu_failed = True
-        # Fallback to CPU
-        if self.interpreter_cpu:
-            self.interpreter_cpu.set_tensor(self.interpreter_cpu.get_input_details()[0]['index'], input_data)
-            self.interpreter_cpu.invoke()
-            output_details = self.interpreter_cpu.get_output_details()
-            boxes = self.interpreter_cpu.get_tensor(output_details[0]['index'])[0]  # Bounding box coordinates
-            classes = self.interpreter_cpu.get_tensor(output_details[1]['index'])[0]  # Class index
-            scores = self.interpreter_cpu.get_tensor(output_details[2]['index'])[0]  # Confidence
-            detections = []
-            # Original frame dimensions (from the input grayscale frame)
-            orig_h, orig_w = frame.shape[:2] 
-
-            for i in range(len(scores)):
-                if int(classes[i]) == 0 and scores[i] > self.threshold:
-                    ymin, xmin, ymax, xmax = boxes[i]
-                    # Bounding box coordinates are relative to the input size of the model (300x300)
-                    # Scale them to the original frame dimensions
-                    detections.append({
-                        'bbox': [
-                            int(xmin * orig_w), 
-                            int(ymin * orig_h), 
-                            int((xmax - xmin) * orig_w), 
-                            int((ymax - ymin) * orig_h)
-                        ],
-                        'score': float(scores[i])
-                    })
-            return detections, 'CPU'
-        return [], 'NONE'
+                if slot.kind != 'TPU':
+                    raise
+                print(f"[ERROR][Inference] TPU execution failed on {slot.name}: {e}")
+                slot.failed = True
+                self.tpu_failed = not any(s.kind == 'TPU' and not s.failed for s in self.slots)
+            finally:
+                self._release_slot(slot, time.time() - start)
+
+    def _invoke_tpu(self, interpreter, input_data):
+        interpreter.set_tensor(interpreter.get_input_details()[0]['index'], input_data)
+        interpreter.invoke()
+        objs = get_objects(interpreter, self.threshold)
+        # Filter for person class only (index 0)
+        return [o for o in objs if hasattr(o, 'id') and o.id == 0]
+
+    def _invoke_cpu(self, interpreter, input_data, frame_shape):
+        interpreter.set_tensor(interpreter.get_input_details()[0]['index'], input_data)
+        interpreter.invoke()
+        output_details = interpreter.get_output_details()
+        boxes = interpreter.get_tensor(output_details[0]['index'])[0]  # Bounding box coordinates
+        classes = interpreter.get_tensor(output_details[1]['index'])[0]  # Class index
+        scores = interpreter.get_tensor(output_details[2]['index'])[0]  # Confidence
+        detections = []
+        # Original frame dimensions (from the input grayscale frame)
+        orig_h, orig_w = frame_shape[:2]
+
+        for i in range(len(scores)):
+            if int(classes[i]) == 0 and scores[i] > self.threshold:
+                ymin, xmin, ymax, xmax = boxes[i]
+                # Bounding box coordinates are relative to the input size of the model (300x300)
+                # Scale them to the original frame dimensions
+                detections.append({
+                    'bbox': [
+                        int(xmin * orig_w), 
+                        int(ymin * orig_h), 
+                        int((xmax - xmin) * orig_w), 
+                        int((ymax - ymin) * orig_h)
+                    ],
+                    'score': float(scores[i])
+                })
+        return detections
+
+
+def nms(boxes, scores, iou_threshold=0.5, containment_threshold=None, groups=None):
+    """Greedy non-maximum suppression on (N, 4) [x, y, w, h] boxes; returns kept indices.
+
+    The pairwise overlap matrix is computed in one vectorized pass. With a
+    `containment_threshold`, a box that lies mostly inside a higher-scoring one is also
+    suppressed, which removes the partial boxes produced where a person straddles a tile
+    border. Given `groups` (e.g. the tile of each box), containment only applies between
+    boxes of different groups, so a person standing in front of another within one tile
+    is kept.
+    """
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = np.maximum(boxes[:, 2], 0) * np.maximum(boxes[:, 3], 0)
+    inter_w = np.clip(np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :]), 0, None)
+    inter_h = np.clip(np.minimum(y2[:, None], y2[None, :]) - np.maximum(y1[:, None], y1[None, :]), 0, None)
+    inter = inter_w * inter_h
+    iou = inter / np.maximum(areas[:, None] + areas[None, :] - inter, 1e-6)
+    overlaps = iou > iou_threshold
+    if containment_threshold is not None:
+        contained = inter / np.maximum(np.minimum(areas[:, None], areas[None, :]), 1e-6) > containment_threshold
+        if groups is not None:
+            contained &= groups[:, None] != groups[None, :]
+        overlaps |= contained
+
+    order = np.argsort(-scores)
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(int(i))
+        suppressed |= overlaps[i]
+    return keep
+
+
+def to_detection_dicts(detections, frame_shape, model_input_size=(480, 480)):
+    """Converts PyCoral objects or CPU dicts to plain {'bbox', 'score'} dicts in frame pixels.
+
+    Plain dicts are cheap to pickle, so this is what crosses process boundaries.
+    """
+    h, w = frame_shape[:2]
+    scale_x, scale_y = w / float(model_input_size[0]), h / float(model_input_size[1])
+    converted = []
+    for det in detections:
+        if hasattr(det, 'score') and hasattr(det, 'bbox'): # PyCoral output
+            bbox = det.bbox
+            converted.append({
+                'bbox': [int(bbox.xmin * scale_x), int(bbox.ymin * scale_y),
+                         int(bbox.width * scale_x), int(bbox.height * scale_y)],
+                'score': float(det.score)
+            })
+        elif isinstance(det, dict) and 'score' in det and 'bbox' in det: # CPU fallback output
+            converted.append({'bbox': list(det['bbox']), 'score': float(det['score'])})
+    return converted
@@ -1,330 +1,547 @@
 import argparse
+import threading
 import time
-from datetime import datetime
+_PROCESS_START = time.time() # Reference point for the time-to-first-detection log
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import json # Added for MQTT JSON payload
 from camera import CameraStream
 from inference import PersonDetector
-from display import DisplayWindow
 from logger import log_person_detected # Keep for local logging if desired
 from mqtt_client import MQTTClient # Added
+from http_stream import MJPEGServer
+from pipeline import MultiProcessPipeline
+from viewers import ViewerTracker, TOPIC_VIEWER_HEARTBEAT
+from rate_control import RateController, TOPIC_RATE_CONTROL
+from control import ControlPlane
+from soak import SoakMonitor
+from presence import PresenceTracker, parse_zone
+from processing import FrameProcessor
+
+# Default ceiling for the main loop and per-camera detection rate (see RateController)
+TARGET_PROCESSING_FPS = 20.0
 
+# How often the rate controller's decisions are published to TOPIC_RATE_CONTROL
+RATE_REPORT_INTERVAL = 5.0
 
-# MQTT Topics
-TOPIC_ALERT = "smart_office/camera/alert"
-TOPIC_LOG = "smart_office/camera/detection_log"
-TOPIC_STREAM_0 = "smart_office/camera/0/stream"
-TOPIC_STREAM_1 = "smart_office/camera/1/stream"
+# Capture rate requested from cameras; video files are paced at this times --replay-speed
+CAPTURE_FPS = 20
 
-# Target processing FPS for the main loop
-TARGET_PROCESSING_FPS = 20.0
-TARGET_LOOP_INTERVAL = 1.0 / TARGET_PROCESSING_FPS
+# Input size of the bundled SSD models, used by --capture-match-model
+MODEL_INPUT_SIZE = (480, 480)
+
+# How often detector stage statistics are printed
+STATS_REPORT_INTERVAL = 30.0
+
+
+def open_camera(index, src, width=640, height=480, **camera_kwargs):
+    cam = CameraStream(src, width=width, height=height, **camera_kwargs).start()
+    if cam and not cam.stopped:
+        print(f"[INFO] Camera {index} (source: {src}) initialized and stream active.")
+    else:
+        print(f"[ERROR] Camera {index} (source: {src}) failed to start or stream is not active.")
+    return cam
+
+
+def build_detector_kwargs(args):
+    return {
+        'model_path_tpu': args.model_tpu,
+        'model_path_cpu': args.model_cpu,
+        'threshold': args.threshold,
+        'cascade_model': args.cascade_model,
+        'cascade_type': args.cascade_type,
+        'cascade_threshold': args.cascade_threshold,
+        'cascade_person_index': args.cascade_person_index,
+        'cascade_hold_frames': args.cascade_hold_frames,
+        'tpu_devices': args.tpu_devices,
+        'cpu_interpreters': args.cpu_interpreters,
+        'cpu_threads': args.cpu_threads,
+        'tile_grid': args.tile_grid,
+        'tile_overlap': args.tile_overlap,
+        'tile_include_full': not args.no_tile_full
+    }
+
+
+def build_camera_kwargs(args):
+    return {
+        'fps': CAPTURE_FPS,
+        'replay_speed': args.replay_speed,
+        'demand_driven': not args.decode_every_frame,
+        'match_size': MODEL_INPUT_SIZE if args.capture_match_model else None
+    }
+
+
+def parse_source(value):
+    """Camera index ('0') or a video file / stream URL."""
+    return int(value) if value.isdigit() else value
+
+
+def parse_camera_grace(value):
+    """argparse type: '1=5.0' -> (1, 5.0)"""
+    try:
+        cam, seconds = value.split('=')
+        cam, seconds = int(cam), float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CAM=SECONDS such as '1=5', got {value!r}")
+    if seconds < 0:
+        raise argparse.ArgumentTypeError(f"grace period must not be negative, got {value!r}")
+    return cam, seconds
+
+
+def parse_camera_zone(value):
+    """argparse type: '0=0,0.5,1,1' -> (0, (0.0, 0.5, 1.0, 1.0))"""
+    try:
+        cam, zone = value.split('=')
+        return int(cam), parse_zone(zone)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"expected CAM=x1,y1,x2,y2 in 0..1, got {value!r} ({e})")
+
+
+def parse_tile_grid(value):
+    """argparse type: '3x2' -> (3, 2) columns x rows; '' disables tiling."""
+    if not value:
+        return None
+    try:
+        cols, rows = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COLSxROWS such as '3x2', got {value!r}")
+    if cols < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"tile grid needs at least 1 column and 1 row, got {value!r}")
+    return (cols, rows)
+
+
+def parse_tile_overlap(value):
+    """argparse type: fractional tile overlap in [0, 1)."""
+    overlap = float(value)
+    if not 0.0 <= overlap < 1.0:
+        raise argparse.ArgumentTypeError(f"tile overlap must be in [0, 1), got {value}")
+    return overlap
+
+
+def load_detector(detector_kwargs):
+    # Warm up before going live so the first real frame does not pay for delegate/allocation setup
+    return PersonDetector(**detector_kwargs).warm_up()
+
+
+def timed_detect(detector, frame, cam_id):
+    start = time.time()
+    detections, engine = detector.detect(frame, cam_id)
+    return detections, engine, time.time() - start
+
+
+def print_pool_stats(stats):
+    summary = ", ".join(
+        f"{s['name']}: {s['utilization'] * 100:.0f}% ({s['invokes']}x{s['avg_ms']:.1f}ms){' FAILED' if s['failed'] else ''}"
+        for s in stats
+    )
+    print(f"[Pool] {summary}")
+
+
+def print_cascade_stats(stats):
+    print(f"[Cascade] frames={stats['frames']} skipped={stats['skipped']} "
+          f"stage1={stats['stage1_invokes']}x{stats['stage1_ms']:.1f}ms "
+          f"stage2={stats['stage2_invokes']}x{stats['stage2_ms']:.1f}ms (regions: {stats['stage2_region_invokes']})")
 
 
 def main(args):
-    # --- MQTT Setup ---
+    startup_start_time = time.time()
     mqtt_client = MQTTClient(args.mqtt_broker, args.mqtt_port)
-    mqtt_client.connect()
-    # Give a moment for the connection to establish
-    time.sleep(1)
-    if not mqtt_client.is_connected:
+    pipeline = None
+    detector = None
+    detector_kwargs = build_detector_kwargs(args)
+    camera_kwargs = build_camera_kwargs(args)
+
+    # --- Startup: broker connection, camera opens and model loading run concurrently ---
+    with ThreadPoolExecutor(max_workers=4) as startup_pool:
+        mqtt_future = startup_pool.submit(mqtt_client.connect)
+        if args.multiprocess:
+            # Capture and inference run in their own processes; this process draws, encodes and publishes
+            pipeline = MultiProcessPipeline(
+                [args.cam0, args.cam1],
+                detector_kwargs=detector_kwargs,
+                width=args.capture_width, height=args.capture_height, fps=CAPTURE_FPS,
+                replay_speed=args.replay_speed, slots=args.ring_slots,
+                inference_workers=args.inference_workers
+            ).start()
+            cam_left, cam_right = pipeline.cameras
+        else:
+            cam_left_future = startup_pool.submit(open_camera, 0, args.cam0, args.capture_width, args.capture_height, **camera_kwargs)
+            cam_right_future = startup_pool.submit(open_camera, 1, args.cam1, args.capture_width, args.capture_height, **camera_kwargs)
+            detector_future = startup_pool.submit(load_detector, detector_kwargs)
+            cam_left = cam_left_future.result()
+            cam_right = cam_right_future.result()
+            detector = detector_future.result()
+        mqtt_future.result()
+
+    # Wait only as long as the broker actually needs instead of a fixed sleep
+    if not mqtt_client.wait_for_connection(args.mqtt_timeout):
         print("[ERROR] Failed to connect to MQTT broker. Exiting.")
         # Optionally handle differently, e.g., run without MQTT?
+        cam_left.stop()
+        cam_right.stop()
+        if pipeline:
+            pipeline.stop()
         return
-
-    # Camera setup
-    cam_left = CameraStream(args.cam0, width=640, height=480, fps=20).start()
-    if cam_left and not cam_left.stopped:
-        print(f"[INFO] Camera 0 (source: {args.cam0}) initialized and stream active.")
-    else:
-        print(f"[ERROR] Camera 0 (source: {args.cam0}) failed to start or stream is not active.")
-
-    cam_right = CameraStream(args.cam1, width=640, height=480, fps=20).start()
-    if cam_right and not cam_right.stopped:
-        print(f"[INFO] Camera 1 (source: {args.cam1}) initialized and stream active.")
-    else:
-        print(f"[ERROR] Camera 1 (source: {args.cam1}) failed to start or stream is not active.")
-
-    # Inference engine
-    detector = PersonDetector(args.model_tpu, args.model_cpu, threshold=args.threshold)
-
-    # Display / Drawing Setup
-    # We need the drawing object even if headless, for stream annotations
-    drawer_left = DisplayWindow("Camera 0")
-    drawer_right = DisplayWindow("Camera 1")
-    if not args.headless:
-        drawer_left.create_window() # Create windows only if not headless
-        drawer_right.create_window()
-
-    # --- State for detection logging ---
-    detection_buffer_cam0 = []
-    detection_buffer_cam1 = []
-    last_detection_time = 0.0 # Timestamp of the last detection event on *any* camera
-    left_detection_fps = 0.0 # Initialize FPS for left camera detection display
-    right_detection_fps = 0.0 # Initialize FPS for right camera detection display
-
-    # --- State for granular person presence alerts ---
-    person_continuously_present_cam0 = False
-    last_person_seen_time_cam0 = 0.0
-    person_continuously_present_cam1 = False
-    last_person_seen_time_cam1 = 0.0
-    NO_PERSON_GRACE_PERIOD = 2.5  # Seconds before declaring a person "gone"
+    print(f"[INFO] Startup completed in {time.time() - startup_start_time:.2f}s")
+    first_detection_pending = True
+    last_stats_report_time = time.time()
+
+    # With several pooled interpreters, cameras are detected concurrently
+    detect_executor = None
+    if detector and detector.pool_size > 1:
+        detect_executor = ThreadPoolExecutor(max_workers=detector.pool_size)
+        print(f"[INFO] Interpreter pool of {detector.pool_size}: running camera detections in parallel.")
+
+    # Optional LAN MJPEG server, fed with the same JPEG bytes that go to MQTT
+    stream_server = None
+    if args.http_port:
+        stream_server = MJPEGServer([0, 1], host=args.http_host, port=args.http_port).start()
+
+    # Viewers announce themselves on TOPIC_VIEWER_HEARTBEAT; unwatched cameras are not drawn or encoded
+    viewer_tracker = ViewerTracker(timeout=args.viewer_timeout)
+    mqtt_client.subscribe(TOPIC_VIEWER_HEARTBEAT, viewer_tracker.on_heartbeat)
+
+    # Per-camera detection rates adapt to loop overruns, inference time and system load
+    rate_controller = RateController(
+        [], max_fps=args.max_fps, min_fps=args.min_fps,
+        target_latency=args.target_latency_ms / 1000.0, idle_after=args.idle_after,
+        enabled=not args.fixed_rate
+    )
+    last_rate_report_time = time.time()
+
+    # --- State for granular person presence alerts, per-camera grace periods and zones ---
+    presence_tracker = PresenceTracker(grace_period=args.grace_period)
+    camera_grace = dict(args.camera_grace or [])
+    camera_zones = {}
+    for cam_id, zone in args.zone or []:
+        camera_zones.setdefault(cam_id, []).append(zone)
+
+    # Per-frame work after detection: detection log, presence, drawing, encoding and publishing
+    frame_processor = FrameProcessor(mqtt_client, presence_tracker, rate_controller, viewer_tracker=viewer_tracker,
+                                     stream_server=stream_server, always_stream=args.always_stream,
+                                     headless=args.headless, jpeg_quality=args.jpeg_quality)
+
+    # --- Per-camera state, keyed by camera id; cameras can be added/removed at runtime ---
+    cameras = {} # cam_id -> CameraStream (or shared-memory view in --multiprocess mode)
+
+    def attach_camera(cam_id, cam):
+        cameras[cam_id] = cam
+        frame_processor.add_camera(cam_id)
+        presence_tracker.add_camera(cam_id, camera_grace.get(cam_id), camera_zones.get(cam_id))
+        rate_controller.add_camera(cam_id)
+        if stream_server:
+            stream_server.add_camera(cam_id)
+
+    def detach_camera(cam_id):
+        cam = cameras.pop(cam_id)
+        frame_processor.remove_camera(cam_id)
+        gone_event = presence_tracker.remove_camera(cam_id)
+        if gone_event: # Close the open presence so listeners do not wait for a departure that never comes
+            frame_processor.publish_presence_event(*gone_event)
+        rate_controller.remove_camera(cam_id)
+        if stream_server:
+            stream_server.remove_camera(cam_id)
+        return cam
+
+    attach_camera(0, cam_left)
+    attach_camera(1, cam_right)
+
+    # --- Runtime control plane: retune and add/remove cameras without reloading interpreters ---
+    control_executor = ThreadPoolExecutor(max_workers=2) # Camera opens/closes block; keep them off the loop
+    control_plane = ControlPlane(mqtt_client)
+
+    def set_threshold(value):
+        if detector is None:
+            raise ValueError("detector runs in the inference processes in --multiprocess mode")
+        value = float(value)
+        if not 0.0 < value < 1.0:
+            raise ValueError(f"threshold must be between 0 and 1, got {value}")
+        old, detector.threshold = detector.threshold, value
+        return f"threshold {old} -> {value}"
+
+    def set_fps(value):
+        value = float(value)
+        if value <= 0:
+            raise ValueError(f"fps must be positive, got {value}")
+        old = rate_controller.max_fps
+        # Only the loop and detection ceiling changes: cameras keep capturing at their own rate and
+        # demand-driven capture already decodes only the frames the loop reads
+        rate_controller.set_max_fps(value)
+        return f"max fps {old} -> {value}"
+
+    def set_jpeg_quality(value):
+        value = int(value)
+        if not 1 <= value <= 100:
+            raise ValueError(f"jpeg quality must be 1-100, got {value}")
+        old, frame_processor.jpeg_params[1] = frame_processor.jpeg_params[1], value
+        return f"jpeg quality {old} -> {value}"
+
+    def add_camera(camera_id, source, width=None, height=None, grace_period=None, zones=None):
+        if pipeline:
+            raise ValueError("cameras cannot be added in --multiprocess mode")
+        cam_id = int(camera_id)
+        if cam_id in cameras:
+            raise ValueError(f"camera {cam_id} already exists")
+        # cv2.VideoCapture only takes a device index or a path/URL; anything else raises cv2.error
+        if isinstance(source, bool) or not isinstance(source, (int, str)) or source == "":
+            raise ValueError(f"source must be a camera index or a file path/URL, got {source!r}")
+        if isinstance(source, str):
+            source = parse_source(source)
+        if grace_period is not None:
+            camera_grace[cam_id] = float(grace_period)
+        if zones is not None:
+            camera_zones[cam_id] = [parse_zone(z) for z in zones]
+        width, height = width or args.capture_width, height or args.capture_height
+
+        def open_and_finish():
+            cam = open_camera(cam_id, source, width, height, **camera_kwargs)
+
+            def finish():
+                if cam.stopped:
+                    control_executor.submit(cam.stop)
+                    raise ValueError(f"camera {cam_id} source {source} could not be opened")
+                if cam_id in cameras:
+                    control_executor.submit(cam.stop)
+                    raise ValueError(f"camera {cam_id} was added by another command meanwhile")
+                attach_camera(cam_id, cam)
+                return f"camera {cam_id} (source: {source}) added"
+            return finish
+        return control_executor.submit(open_and_finish)
+
+    def remove_camera(camera_id):
+        if pipeline:
+            raise ValueError("cameras cannot be removed in --multiprocess mode")
+        cam_id = int(camera_id)
+        if cam_id not in cameras:
+            raise ValueError(f"camera {cam_id} does not exist")
+        cam = detach_camera(cam_id)
+        control_executor.submit(cam.stop) # Joining the capture thread can take seconds
+        return f"camera {cam_id} removed"
+
+    def set_grace_period(camera_id, value):
+        cam_id, value = int(camera_id), float(value)
+        if cam_id not in cameras:
+            raise ValueError(f"camera {cam_id} does not exist")
+        if value < 0:
+            raise ValueError(f"grace period must not be negative, got {value}")
+        camera_grace[cam_id] = value
+        presence_tracker.set_grace_period(cam_id, value)
+        return f"camera {cam_id} grace period -> {value}s"
+
+    def set_zones(camera_id, zones):
+        cam_id = int(camera_id)
+        if cam_id not in cameras:
+            raise ValueError(f"camera {cam_id} does not exist")
+        parsed = [parse_zone(z) for z in zones or []]
+        camera_zones[cam_id] = parsed
+        presence_tracker.set_zones(cam_id, parsed)
+        return f"camera {cam_id} zones -> {parsed or 'whole frame'}"
+
+    control_plane.register('set_threshold', set_threshold)
+    control_plane.register('set_fps', set_fps)
+    control_plane.register('set_jpeg_quality', set_jpeg_quality)
+    control_plane.register('add_camera', add_camera)
+    control_plane.register('remove_camera', remove_camera)
+    control_plane.register('set_grace_period', set_grace_period)
+    control_plane.register('set_zones', set_zones)
+    control_plane.start()
+
+    # Optional soak mode: sample memory, queue depths and stage latencies, report drift at exit
+    soak_monitor = None
+    if args.soak:
+        soak_monitor = SoakMonitor(interval=args.soak_interval,
+                                   duration=args.soak_hours * 3600 if args.soak_hours else None)
+        soak_monitor.add_gauge('detection_buffer_entries', lambda: sum(len(b) for b in frame_processor.detection_buffers.values()))
+        soak_monitor.add_gauge('mqtt_queue', mqtt_client.queue_depth)
+        soak_monitor.add_gauge('control_pending', lambda: control_plane.pending.qsize() + len(control_plane.in_flight))
+        soak_monitor.add_gauge('viewers', lambda: len(viewer_tracker.viewers))
+        soak_monitor.add_gauge('threads', threading.active_count)
+        if stream_server:
+            soak_monitor.add_gauge('http_clients', lambda: sum(slot.clients for slot in list(stream_server.slots.values())))
+        if pipeline:
+            soak_monitor.add_gauge('pipeline_pending', lambda: len(pipeline.pending))
+        soak_monitor.start()
+        frame_processor.soak_monitor = soak_monitor
 
     try:
         while True:
             loop_start_time = time.time() # Record start time of the loop iteration
-
-            # Frame acquisition
-            frame_left = None
-            if not cam_left.stopped:
-                frame_left = cam_left.read()
-                # Optional: if frame_left is None and not cam_left.stopped:
-                #     print(f"[WARN] Left camera ({args.cam0}) active but no frame received this cycle (read returned None).")
-
-            frame_right = None
-            if not cam_right.stopped:
-                frame_right = cam_right.read()
-                # Optional: if frame_right is None and not cam_right.stopped:
-                #     print(f"[WARN] Right camera ({args.cam1}) active but no frame received this cycle (read returned None).")
-            
-            # Exit main loop only if BOTH cameras are stopped
-            # REMOVED: This condition is removed to allow cameras to attempt reconnection.
-            # if cam_left.stopped and cam_right.stopped:
-            #     print("[INFO] Both camera streams appear to be stopped. Exiting main processing loop.")
-            #     break
+            control_plane.apply_pending() # Configuration changes land between frames
+
+            # Frame acquisition, only for cameras the rate controller says are due
+            due_cameras = [cam_id for cam_id in cameras if rate_controller.should_process(cam_id, loop_start_time)]
+            frames = {}
+            results = {}
+            for cam_id in due_cameras:
+                if pipeline:
+                    # Each result is (frame, detections, engine, detection_time) from the inference process
+                    result = pipeline.read(cam_id)
+                    if result:
+                        frames[cam_id] = result[0]
+                        results[cam_id] = result
+                elif not cameras[cam_id].stopped:
+                    frame = cameras[cam_id].read()
+                    if frame is not None:
+                        frames[cam_id] = frame
+            if soak_monitor:
+                soak_monitor.record_latency('acquire', time.time() - loop_start_time)
+
+            if detect_executor and len(frames) > 1:
+                futures = {cam_id: detect_executor.submit(timed_detect, detector, frame, cam_id) for cam_id, frame in frames.items()}
+                for cam_id, future in futures.items():
+                    results[cam_id] = (frames[cam_id],) + future.result()
 
             current_time = time.time()
-            jpeg_quality = [int(cv2.IMWRITE_JPEG_QUALITY), 75] # Define once
-
-            # --- Process Left Camera ---
-            if frame_left is not None:
-                detection_start_time = time.time()
-                detections_left, engine_left = detector.detect(frame_left)
-                detection_time_left = time.time() - detection_start_time
-                if detection_time_left > 0:
-                    left_detection_fps = 1.0 / detection_time_left
-                else:
-                    left_detection_fps = 0 # Avoid division by zero
-                
-                processed_detections_left = []
-                person_detected_left = False
-
-                for det in detections_left:
-                    temp_bbox = None
-                    temp_score = None
-                    if hasattr(det, 'score') and hasattr(det, 'bbox'): # PyCoral output
-                        temp_score = det.score
-                        bbox = det.bbox
-                        h, w = frame_left.shape[:2]
-                        model_input_w, model_input_h = 480.0, 480.0
-                        scale_x, scale_y = w / model_input_w, h / model_input_h
-                        temp_bbox = [
-                            int(bbox.xmin * scale_x), int(bbox.ymin * scale_y),
-                            int(bbox.width * scale_x), int(bbox.height * scale_y)
-                        ]
-                    elif isinstance(det, dict) and 'score' in det and 'bbox' in det: # CPU fallback output
-                        temp_score = det['score']
-                        temp_bbox = det['bbox']
-
-                    if temp_score is not None and temp_bbox is not None:
-                        processed_detections_left.append({'bbox': temp_bbox, 'score': temp_score})
-                        detection_data = {
-                            "timestamp": datetime.now().isoformat(),
-                            "confidence": float(temp_score),
-                            "bbox": temp_bbox
-                        }
-                        detection_buffer_cam0.append(detection_data)
-                        person_detected_left = True
-                
-                if person_detected_left:
-                     last_person_seen_time_cam0 = current_time # Update when person is seen
-                     if not person_continuously_present_cam0:
-                         person_continuously_present_cam0 = True
-                         alert_payload = {
-                             "status": "PERSON_DETECTED",
-                             "camera_id": "Camera 0",
-                             "message": f"Unauthorized Entrance! Person Detected from Camera 0 at {datetime.now().strftime('%H:%M:%S')}"
-                         }
-                         mqtt_client.publish(TOPIC_ALERT, alert_payload, qos=1)
-                         print("[MQTT] Sent PERSON_DETECTED alert for Camera 0")
-                     last_detection_time = current_time # Global log timer
-                # else: # This 'else' would be if person_detected_left is false for the current frame
-                    # The 'gone' logic is handled later based on timeout
-
-                # Calculate FPS, Draw Overlays
-                annotated_frame_left = drawer_left.draw_overlays(frame_left, detections=processed_detections_left, fps=left_detection_fps)
-                
-                if not args.headless:
-                    cv2.imshow(drawer_left.window_name, annotated_frame_left)
-
-                # Stream Left Frame
-                ret_l, buffer_l = cv2.imencode('.jpg', annotated_frame_left, jpeg_quality)
-                if ret_l:
-                    mqtt_client.publish(TOPIC_STREAM_0, buffer_l.tobytes(), qos=0)
-                else:
-                    if not cam_left.stopped: # Camera is supposed to be active but gave no frame
-                        print("[WARN] Left camera: No frame to process this cycle, but stream is reported active.")
-                    # If cam_left.stopped is True, we just skip, no message needed as it's expected.
-                    else:
-                        print("[WARN] Failed to encode left frame for MQTT.")
-            else:
-                if cam_left.stopped:
-                    print(f"[INFO] Left camera ({args.cam0}) is currently disconnected. Waiting for reconnection...")
-                elif not cam_left.stopped and frame_left is None: # Should ideally not happen if read() is robust, but good for debug
-                    print(f"[INFO] Left camera ({args.cam0}) is active but no frame was processed/available this cycle.")
-                # No message if cam_left.stopped is False and frame_left was processed, or if it was stopped and we expect no frame.
-
-            # --- Process Right Camera ---
-            if frame_right is not None:
-                detection_start_time_right = time.time()
-                detections_right, engine_right = detector.detect(frame_right)
-                detection_time_right = time.time() - detection_start_time_right
-                if detection_time_right > 0:
-                    right_detection_fps = 1.0 / detection_time_right
-                else:
-                    right_detection_fps = 0 # Avoid division by zero
-
-                processed_detections_right = []
-                person_detected_right = False
-
-                for det in detections_right:
-                    temp_bbox = None
-                    temp_score = None
-                    if hasattr(det, 'score') and hasattr(det, 'bbox'): # PyCoral output
-                        temp_score = det.score
-                        bbox = det.bbox
-                        h, w = frame_right.shape[:2]
-                        model_input_w, model_input_h = 480.0, 480.0
-                        scale_x, scale_y = w / model_input_w, h / model_input_h
-                        temp_bbox = [
-                            int(bbox.xmin * scale_x), int(bbox.ymin * scale_y),
-                            int(bbox.width * scale_x), int(bbox.height * scale_y)
-                        ]
-                    elif isinstance(det, dict) and 'score' in det and 'bbox' in det: # CPU fallback output
-                        temp_score = det['score']
-                        temp_bbox = det['bbox']
-
-                    if temp_score is not None and temp_bbox is not None:
-                        processed_detections_right.append({'bbox': temp_bbox, 'score': temp_score})
-                        detection_data = {
-                            "timestamp": datetime.now().isoformat(),
-                            "confidence": float(temp_score),
-                            "bbox": temp_bbox
-                        }
-                        detection_buffer_cam1.append(detection_data)
-                        person_detected_right = True
-
-                if person_detected_right:
-                     last_person_seen_time_cam1 = current_time # Update when person is seen
-                     if not person_continuously_present_cam1:
-                         person_continuously_present_cam1 = True
-                         alert_payload = {
-                             "status": "PERSON_DETECTED",
-                             "camera_id": "Camera 1",
-                             "message": f"Unauthorized Entrance! Person Detected from Camera 1 at {datetime.now().strftime('%H:%M:%S')}"
-                         }
-                         mqtt_client.publish(TOPIC_ALERT, alert_payload, qos=1)
-                         print("[MQTT] Sent PERSON_DETECTED alert for Camera 1")
-                     last_detection_time = current_time # Global log timer
-                # else: # This 'else' for person_detected_right is false
-                    # The 'gone' logic is handled later
-
-                # Calculate FPS, Draw Overlays
-                annotated_frame_right = drawer_right.draw_overlays(frame_right, detections=processed_detections_right, fps=right_detection_fps)
-
-                if not args.headless:
-                     cv2.imshow(drawer_right.window_name, annotated_frame_right)
-
-                # Stream Right Frame
-                ret_r, buffer_r = cv2.imencode('.jpg', annotated_frame_right, jpeg_quality)
-                if ret_r:
-                    mqtt_client.publish(TOPIC_STREAM_1, buffer_r.tobytes(), qos=0)
+
+            for cam_id in due_cameras:
+                cam = cameras[cam_id]
+                frame = frames.get(cam_id)
+                if frame is None:
+                    if cam.stopped:
+                        print(f"[INFO] Camera {cam_id} ({cam.src}) is currently disconnected. Waiting for reconnection...")
+                    # Otherwise no new frame since the last read (the loop is faster than the camera); skip it
+                    continue
+
+                if cam_id in results:
+                    _, detections, engine, detection_time = results[cam_id]
                 else:
-                    if not cam_right.stopped: # Camera is supposed to be active but gave no frame
-                        print("[WARN] Right camera: No frame to process this cycle, but stream is reported active.")
-                    # If cam_right.stopped is True, we just skip.
-                    else:
-                        print("[WARN] Failed to encode right frame for MQTT.")
-            else:
-                if cam_right.stopped:
-                    print(f"[INFO] Right camera ({args.cam1}) is currently disconnected. Waiting for reconnection...")
-                elif not cam_right.stopped and frame_right is None: # Debug / transient state
-                    print(f"[INFO] Right camera ({args.cam1}) is active but no frame was processed/available this cycle.")
-
-            # --- Check for person disappearance (after processing both cameras) ---
-            # Use a consistent current time for these checks
-            current_time_for_disappearance_check = time.time()
-
-            if (person_continuously_present_cam0 and
-               (current_time_for_disappearance_check - last_person_seen_time_cam0 > NO_PERSON_GRACE_PERIOD)):
-                # This implies person_detected_left has been false for NO_PERSON_GRACE_PERIOD
-                person_continuously_present_cam0 = False
-                status_payload = {
-                    "status": "PERSON_GONE",
-                    "camera_id": "Camera 0",
-                    "message": f"Person no longer detected at Camera 0 ({datetime.now().strftime('%H:%M:%S')})"
-                }
-                mqtt_client.publish(TOPIC_ALERT, status_payload, qos=1) # Send to same alert topic
-                print(f"[MQTT] Sent PERSON_GONE for Cam0. Grace: {current_time_for_disappearance_check - last_person_seen_time_cam0:.1f}s.")
-
-            if (person_continuously_present_cam1 and
-               (current_time_for_disappearance_check - last_person_seen_time_cam1 > NO_PERSON_GRACE_PERIOD)):
-                # This implies person_detected_right has been false for NO_PERSON_GRACE_PERIOD
-                person_continuously_present_cam1 = False
-                status_payload = {
-                    "status": "PERSON_GONE",
-                    "camera_id": "Camera 1",
-                    "message": f"Person no longer detected at Camera 1 ({datetime.now().strftime('%H:%M:%S')})"
-                }
-                mqtt_client.publish(TOPIC_ALERT, status_payload, qos=1) # Send to same alert topic
-                print(f"[MQTT] Sent PERSON_GONE for Cam1. Grace: {current_time_for_disappearance_check - last_person_seen_time_cam1:.1f}s.")
-
-            # --- Check for logging buffer timeout ---
-            if last_detection_time > 0 and (current_time - last_detection_time) > 5.0: # Check global log timer
-                if detection_buffer_cam0 or detection_buffer_cam1:
-                    print(f"[MQTT] Sending detection log ({(current_time - last_detection_time):.1f}s since last detection)")
-                    log_payload = {
-                        "detection_period_end": datetime.now().isoformat(),
-                        "camera_0_detections": detection_buffer_cam0,
-                        "camera_1_detections": detection_buffer_cam1
-                    }
-                    mqtt_client.publish(TOPIC_LOG, log_payload, qos=1)
-                    detection_buffer_cam0 = []
-                    detection_buffer_cam1 = []
-                last_detection_time = 0.0
+                    detection_start_time = time.time()
+                    detections, engine = detector.detect(frame, cam_id)
+                    detection_time = time.time() - detection_start_time
+                if first_detection_pending:
+                    first_detection_pending = False
+                    print(f"[INFO] Time to first detection: {time.time() - _PROCESS_START:.2f}s after process start")
+                frame_processor.process_frame(cam_id, frame, detections, detection_time, current_time)
+
+            # --- Presence transitions for all cameras in one pass, then the detection log when it is due ---
+            frame_processor.end_pass(current_time)
+
+            # --- Periodic detector stage statistics (single-process mode) ---
+            if detector and current_time - last_stats_report_time > STATS_REPORT_INTERVAL:
+                last_stats_report_time = current_time
+                cascade_stats = detector.cascade_stats()
+                if cascade_stats:
+                    print_cascade_stats(cascade_stats)
+                if len(detector.slots) > 1:
+                    print_pool_stats(detector.pool_stats())
+                tiling_stats = detector.tiling_stats()
+                if tiling_stats:
+                    print(f"[Tiling] frames={tiling_stats['frames']} tiles/frame={tiling_stats['tiles_per_frame']:.1f} "
+                          f"avg={tiling_stats['frame_ms']:.1f}ms merged_away={tiling_stats['merged_away']}")
+                for cam_id, cam in cameras.items():
+                    capture_stats = cam.capture_stats()
+                    print(f"[Capture] Camera {cam_id}: grabbed={capture_stats['grabbed']} decoded={capture_stats['decoded']} "
+                          f"decodes_saved={capture_stats['decodes_saved']} ({capture_stats['saved_ratio'] * 100:.0f}%)")
+
+            # --- Publish the rate controller's current decisions ---
+            if current_time - last_rate_report_time > RATE_REPORT_INTERVAL:
+                last_rate_report_time = current_time
+                mqtt_client.publish(TOPIC_RATE_CONTROL, rate_controller.metrics(), qos=0)
 
             # Quit condition
             if not args.headless and cv2.waitKey(1) & 0xFF == ord('q'):
                 break
+            if soak_monitor and soak_monitor.finished:
+                print(f"[Soak] Soak duration of {args.soak_hours}h reached.")
+                break
 
-            # --- Throttle the main loop to target processing FPS ---
+            # --- Feed the rate controller, then throttle the main loop to its ceiling ---
             loop_elapsed_time = time.time() - loop_start_time
-            
-            sleep_duration = TARGET_LOOP_INTERVAL - loop_elapsed_time
+            rate_controller.end_loop(loop_elapsed_time)
+            if soak_monitor:
+                soak_monitor.record_latency('loop', loop_elapsed_time)
+
+            sleep_duration = rate_controller.loop_interval - loop_elapsed_time
             if sleep_duration > 0:
                 time.sleep(sleep_duration)
 
     finally:
         print("Cleaning up...")
-        cam_left.stop()
-        cam_right.stop()
-        if not args.headless:
-             # drawer_left/right are DisplayWindow instances
-             drawer_left.close()
-             drawer_right.close()
+        if soak_monitor:
+            soak_monitor.stop(args.soak_report)
+        if detect_executor:
+            detect_executor.shutdown(wait=False)
+        control_executor.shutdown(wait=True)
+        for cam in cameras.values():
+            cam.stop()
+        frame_processor.close()
         cv2.destroyAllWindows() # Close any OpenCV windows
+        if stream_server:
+            stream_server.stop()
+        if pipeline:
+            pipeline.stop()
         mqtt_client.disconnect()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--cam0', type=int, default=0, help='Camera 0 index')
-    parser.add_argument('--cam1', type=int, default=2, help='Camera 1 index')
+    parser.add_argument('--cam0', type=parse_source, default=0, help='Camera 0 index or video file')
+    parser.add_argument('--cam1', type=parse_source, default=2, help='Camera 1 index or video file')
     parser.add_argument('--model_tpu', type=str, default='models/output_tflite_graph_edgetpu.tflite')
     parser.add_argument('--model_cpu', type=str, default='models/ssd_mobilenet_v2_coco_quant_postprocess.tflite')
     parser.add_argument('--threshold', type=float, default=0.7)
+    parser.add_argument('--cascade-model', type=str, default=None,
+                        help='Optional cheap first-stage model; the full model only runs on frames/regions it flags')
+    parser.add_argument('--cascade-type', type=str, default='detector', choices=['detector', 'classifier'],
+                        help='First-stage output format: SSD-style detector or person/no-person classifier')
+    parser.add_argument('--cascade-threshold', type=float, default=0.3, help='First-stage person score to run the full model')
+    parser.add_argument('--cascade-person-index', type=int, default=None,
+                        help='Person class id (detector, default 0) or person output of the classifier '
+                             '(default 1 for two or more outputs, 0 for a single sigmoid)')
+    parser.add_argument('--cascade-hold-frames', type=int, default=5,
+                        help='Frames to keep running the full model after a confirmed person')
+    parser.add_argument('--tpu-devices', type=str, nargs='*', default=None,
+                        help="Edge TPU devices for the interpreter pool, e.g. ':0' ':1' or 'usb:0' 'pci:0' (no values: CPU only)")
+    parser.add_argument('--cpu-interpreters', type=int, default=1, help='CPU interpreters in the pool')
+    parser.add_argument('--cpu-threads', type=int, default=None, help='num_threads for each CPU interpreter')
+    parser.add_argument('--capture-width', type=int, default=640, help='Requested camera capture width')
+    parser.add_argument('--capture-height', type=int, default=480, help='Requested camera capture height')
+    parser.add_argument('--capture-match-model', action='store_true',
+                        help='Open cameras at the supported resolution closest to the model input instead of --capture-width/height')
+    parser.add_argument('--decode-every-frame', action='store_true',
+                        help='Decode every captured frame instead of only those the main loop will read')
+    parser.add_argument('--tile-grid', type=parse_tile_grid, default=None,
+                        help="Tiled inference for high-resolution cameras, as COLSxROWS (e.g. '3x2')")
+    parser.add_argument('--tile-overlap', type=parse_tile_overlap, default=0.2, help='Fractional overlap between neighbouring tiles')
+    parser.add_argument('--no-tile-full', action='store_true',
+                        help='Do not add the downscaled whole frame to the tile batch')
+    parser.add_argument('--grace-period', type=float, default=2.5,
+                        help='Seconds without a person before PERSON_GONE is sent')
+    parser.add_argument('--camera-grace', type=parse_camera_grace, nargs='*', default=None,
+                        help="Per-camera grace periods as CAM=SECONDS, e.g. '1=5'")
+    parser.add_argument('--zone', type=parse_camera_zone, action='append', default=None,
+                        help="Presence zone as CAM=x1,y1,x2,y2 in 0..1 frame coordinates; repeat for more zones")
     parser.add_argument('--headless', action='store_true', help='Run without display windows')
     parser.add_argument('--mqtt-broker', type=str, default='192.168.5.135', help='MQTT broker address')
     parser.add_argument('--mqtt-port', type=int, default=1883, help='MQTT broker port')
+    parser.add_argument('--mqtt-timeout', type=float, default=5.0, help='Seconds to wait for the broker at startup')
+    parser.add_argument('--always-stream', action='store_true',
+                        help='Encode and publish every frame even when no viewer has announced itself')
+    parser.add_argument('--viewer-timeout', type=float, default=6.0,
+                        help='Seconds without a viewer heartbeat before its cameras stop being encoded')
+    parser.add_argument('--http-port', type=int, default=0, help='Serve MJPEG streams over HTTP on this port (0 disables)')
+    parser.add_argument('--multiprocess', action='store_true',
+                        help='Run capture and inference in separate processes connected by shared memory')
+    parser.add_argument('--inference-workers', type=int, default=1,
+                        help='Inference processes in --multiprocess mode (cameras are split between them)')
+    parser.add_argument('--ring-slots', type=int, default=8, help='Frames kept per camera in the shared-memory ring')
+    parser.add_argument('--jpeg-quality', type=int, default=75, help='JPEG quality of the published streams')
+    parser.add_argument('--max-fps', type=float, default=TARGET_PROCESSING_FPS,
+                        help='Main loop rate and highest per-camera detection rate')
+    parser.add_argument('--min-fps', type=float, default=1.0, help='Lowest rate the controller degrades a camera to')
+    parser.add_argument('--target-latency-ms', type=float, default=100.0,
+                        help='Loop work time the rate controller tries to stay under')
+    parser.add_argument('--idle-after', type=float, default=10.0,
+                        help='Seconds without a person before a camera counts as idle (degraded first)')
+    parser.add_argument('--fixed-rate', action='store_true',
+                        help='Disable the adaptive rate controller and process every camera at --max-fps')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Play video file sources this many times faster than real time (soak tests)')
+    parser.add_argument('--soak', action='store_true',
+                        help='Sample RSS, tracemalloc, queue depths and stage latency and print a drift report at exit')
+    parser.add_argument('--soak-hours', type=float, default=None, help='Stop the soak run after this many hours')
+    parser.add_argument('--soak-interval', type=float, default=60.0, help='Seconds between soak samples')
+    parser.add_argument('--soak-report', type=str, default=None, help='Write the drift report and samples to this JSON file')
+    parser.add_argument('--http-host', type=str, default='0.0.0.0', help='Bind address for the MJPEG HTTP server')
 
     args = parser.parse_args()
     main(args)
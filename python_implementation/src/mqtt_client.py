@@ -1,6 +1,7 @@
 import paho.mqtt.client as mqtt
 import time
 import json
+import threading
 
 class MQTTClient:
     def __init__(self, broker_address, port=1883, client_id=""):
@@ -10,6 +11,8 @@ class MQTTClient:
         self.client_id = client_id if client_id else f"python-mqtt-{int(time.time())}"
         self.client = mqtt.Client(client_id=self.client_id)
         self.is_connected = False
+        self.connected_event = threading.Event() # Set by _on_connect, replaces fixed sleeps after connect()
+        self.subscriptions = {} # topic -> qos, re-subscribed after every (re)connect
 
         # Assign callbacks
         self.client.on_connect = self._on_connect
@@ -19,6 +22,9 @@ class MQTTClient:
         if rc == 0:
             print(f"[MQTT] Connected successfully to broker at {self.broker_address}")
             self.is_connected = True
+            for topic, qos in self.subscriptions.items():
+                self.client.subscribe(topic, qos)
+            self.connected_event.set()
         else:
             print(f"[MQTT] Connection failed with code {rc}")
             self.is_connected = False
@@ -26,6 +32,7 @@ class MQTTClient:
     def _on_disconnect(self, client, userdata, rc):
         print(f"[MQTT] Disconnected with result code {rc}")
         self.is_connected = False
+        self.connected_event.clear()
         # Optional: Implement automatic reconnection logic here if needed
 
     def connect(self):
@@ -37,6 +44,25 @@ class MQTTClient:
             print(f"[MQTT] Connection error: {e}")
             self.is_connected = False
 
+    def subscribe(self, topic, callback, qos=0):
+        """Calls `callback(topic, payload_bytes)` for messages on `topic` (wildcards allowed).
+
+        The callback runs on paho's network thread and should return quickly.
+        """
+        self.client.message_callback_add(topic, lambda client, userdata, msg: callback(msg.topic, msg.payload))
+        self.subscriptions[topic] = qos
+        if self.is_connected:
+            self.client.subscribe(topic, qos)
+
+    def queue_depth(self):
+        """Messages paho still holds (queued or awaiting acknowledgement); 0 if not exposed by this paho version."""
+        return len(getattr(self.client, '_out_messages', ())) + len(getattr(self.client, '_out_packet', ()))
+
+    def wait_for_connection(self, timeout=5.0):
+        """Blocks until the broker acknowledges the connection or `timeout` expires."""
+        self.connected_event.wait(timeout)
+        return self.is_connected
+
     def disconnect(self):
         if self.is_connected:
             print("[MQTT] Disconnecting...")
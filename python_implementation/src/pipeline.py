@@ -0,0 +1,203 @@
+import multiprocessing as mp
+import queue
+import time
+
+from frame_bus import SharedFrameRing
+
+
+def _capture_worker(src, ring_spec, fps, replay_speed, stop_event):
+    """Runs one CameraStream in its own process and copies new frames into the ring."""
+    from camera import CameraStream
+
+    ring = SharedFrameRing.attach(ring_spec)
+    cam = CameraStream(src, width=ring_spec['width'], height=ring_spec['height'], fps=fps,
+                       replay_speed=replay_speed).start()
+    last_count = 0
+    try:
+        while not stop_event.is_set():
+            ring.set_active(not cam.stopped)
+            if cam.frame_count != last_count:
+                last_count = cam.frame_count
+                frame = cam.read()
+                if frame is not None:
+                    ring.write(frame)
+                    continue
+            time.sleep(0.002)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.set_active(False)
+        cam.stop()
+        ring.close()
+
+
+def _inference_worker(ring_specs, cam_indices, detector_kwargs, result_queue, stop_event):
+    """Runs a PersonDetector in its own process.
+
+    Reads the newest frame of each assigned camera straight from shared memory and
+    sends back only (camera, seq, detections, engine, inference time).
+    """
+    from inference import PersonDetector, to_detection_dicts
+
+    rings = {idx: SharedFrameRing.attach(ring_specs[idx]) for idx in cam_indices}
+    last_seq = {idx: 0 for idx in cam_indices}
+    last_stats_time = time.time()
+    try:
+        detector = PersonDetector(**detector_kwargs).warm_up()
+        while not stop_event.is_set():
+            if time.time() - last_stats_time > 30.0:
+                last_stats_time = time.time()
+                stats = detector.cascade_stats()
+                if stats:
+                    print(f"[Pipeline][Cascade] cameras={cam_indices} frames={stats['frames']} skipped={stats['skipped']} "
+                          f"stage1={stats['stage1_invokes']}x{stats['stage1_ms']:.1f}ms "
+                          f"stage2={stats['stage2_invokes']}x{stats['stage2_ms']:.1f}ms")
+            did_work = False
+            for idx, ring in rings.items():
+                if ring.latest_seq == last_seq[idx]:
+                    continue
+                seq, frame, _ = ring.read_latest()
+                if frame is None:
+                    continue
+                last_seq[idx] = seq
+                did_work = True
+                start = time.time()
+                detections, engine = detector.detect(frame, idx)
+                detection_time = time.time() - start
+                try:
+                    result_queue.put_nowait((idx, seq, to_detection_dicts(detections, frame.shape), engine, detection_time))
+                except queue.Full:
+                    pass # Consumer is behind; it only ever wants the newest result anyway
+            if not did_work:
+                time.sleep(0.002)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        # Exit non-zero; the main process notices in MultiProcessPipeline.check_processes()
+        print(f"[Pipeline] Inference worker for cameras {cam_indices} failed: {e}")
+        raise
+    finally:
+        for ring in rings.values():
+            ring.close()
+
+
+class _RingCameraView:
+    """Stands in for a CameraStream in the main process (`stopped`, `read()`, `stop()`)."""
+
+    def __init__(self, src, ring):
+        self.src = src
+        self.ring = ring
+
+    @property
+    def stopped(self):
+        return not self.ring.active
+
+    def read(self):
+        _, frame, _ = self.ring.read_latest()
+        return frame
+
+    def stop(self):
+        pass # Capture processes are stopped by MultiProcessPipeline.stop()
+
+
+class MultiProcessPipeline:
+    """Capture and inference in separate processes, connected by shared-memory frame rings.
+
+    Each camera gets a capture process writing into its own SharedFrameRing. One or more
+    inference processes read the rings and return small result tuples over a queue. The
+    main process pairs each result with its frame (by sequence number) for drawing,
+    encoding and publishing, so the GIL is no longer shared between the stages.
+    """
+
+    def __init__(self, sources, detector_kwargs, width=640, height=480, fps=20, slots=8, inference_workers=1,
+                 replay_speed=1.0):
+        self.ctx = mp.get_context('spawn') # Never fork a process that already runs MQTT/camera threads
+        self.sources = list(sources)
+        self.fps = fps
+        self.replay_speed = replay_speed # File sources only
+        self.detector_kwargs = detector_kwargs
+        self.inference_workers = max(1, min(inference_workers, len(self.sources)))
+        self.rings = [SharedFrameRing(slots=slots, width=width, height=height, create=True) for _ in self.sources]
+        self.cameras = [_RingCameraView(src, ring) for src, ring in zip(self.sources, self.rings)]
+        self.result_queue = self.ctx.Queue(maxsize=64)
+        self.stop_event = self.ctx.Event()
+        self.processes = []
+        self.pending = {} # cam index -> newest result not yet handed to the main loop
+        self.results_skipped = 0
+        self.frames_lost = 0
+        self.last_health_check = 0.0
+
+    def start(self):
+        ring_specs = [ring.spec() for ring in self.rings]
+        for src, spec in zip(self.sources, ring_specs):
+            p = self.ctx.Process(target=_capture_worker, args=(src, spec, self.fps, self.replay_speed, self.stop_event),
+                                 name=f"capture-{src}", daemon=True)
+            p.start()
+            self.processes.append(p)
+        for worker in range(self.inference_workers):
+            cam_indices = list(range(worker, len(self.sources), self.inference_workers))
+            worker_kwargs = dict(self.detector_kwargs)
+            if self.inference_workers > 1:
+                # An Edge TPU can only be opened by one process: split the devices between workers
+                # (None = the default device). Workers left without a device get an explicit empty
+                # list, i.e. CPU only, instead of falling back to a TPU another worker holds.
+                devices = worker_kwargs.get('tpu_devices')
+                if devices is None:
+                    devices = [None]
+                worker_kwargs['tpu_devices'] = list(devices)[worker::self.inference_workers]
+                if not worker_kwargs['tpu_devices']:
+                    print(f"[Pipeline] inference-{worker} has no Edge TPU left; it runs on CPU.")
+            p = self.ctx.Process(target=_inference_worker,
+                                 args=(ring_specs, cam_indices, worker_kwargs, self.result_queue, self.stop_event),
+                                 name=f"inference-{worker}", daemon=True)
+            p.start()
+            self.processes.append(p)
+        print(f"[Pipeline] Started {len(self.sources)} capture and {self.inference_workers} inference process(es).")
+        return self
+
+    def _drain(self):
+        while True:
+            try:
+                idx, seq, detections, engine, detection_time = self.result_queue.get_nowait()
+            except queue.Empty:
+                return
+            if idx in self.pending:
+                self.results_skipped += 1
+            self.pending[idx] = (seq, detections, engine, detection_time)
+
+    def check_processes(self):
+        """Raises RuntimeError if a capture or inference process has died while the pipeline runs."""
+        if self.stop_event.is_set():
+            return
+        dead = [p for p in self.processes if not p.is_alive()]
+        if dead:
+            details = ", ".join(f"{p.name} (exit code {p.exitcode})" for p in dead)
+            raise RuntimeError(f"pipeline process(es) died: {details}; see their output above")
+
+    def read(self, idx):
+        """Returns (frame, detections, engine, detection_time) for the newest unseen result, or None."""
+        now = time.time()
+        if now - self.last_health_check > 1.0:
+            self.last_health_check = now
+            self.check_processes()
+        self._drain()
+        result = self.pending.pop(idx, None)
+        if result is None:
+            return None
+        seq, detections, engine, detection_time = result
+        frame, _ = self.rings[idx].read(seq)
+        if frame is None:
+            self.frames_lost += 1 # Ring wrapped before we got to it; increase slots if this grows
+            return None
+        return frame, detections, engine, detection_time
+
+    def stop(self):
+        self.stop_event.set()
+        for p in self.processes:
+            p.join(timeout=3.0)
+            if p.is_alive():
+                print(f"[Pipeline] {p.name} did not exit in time, terminating.")
+                p.terminate()
+        for ring in self.rings:
+            ring.close()
+        print(f"[Pipeline] Stopped. Results skipped: {self.results_skipped}, frames lost: {self.frames_lost}")
@@ -0,0 +1,147 @@
+import json
+import time
+
+import numpy as np
+
+PERSON_DETECTED = "PERSON_DETECTED"
+PERSON_GONE = "PERSON_GONE"
+
+_TIME_PLACEHOLDER = "@@TIME@@"
+
+
+def _payload_template(payload):
+    """Splits the JSON encoding of `payload` around the time placeholder: (prefix, suffix)."""
+    prefix, suffix = json.dumps(payload).split(_TIME_PLACEHOLDER)
+    return prefix.encode(), suffix.encode()
+
+
+def parse_zone(value):
+    """'x1,y1,x2,y2' (or a 4-item sequence) in 0..1 frame coordinates -> (x1, y1, x2, y2)."""
+    if isinstance(value, str):
+        value = value.split(',')
+    x1, y1, x2, y2 = (float(v) for v in value)
+    if not (0.0 <= x1 < x2 <= 1.0 and 0.0 <= y1 < y2 <= 1.0):
+        raise ValueError(f"zone {value} must satisfy 0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1")
+    return (x1, y1, x2, y2)
+
+
+class PresenceTracker:
+    """PERSON_DETECTED / PERSON_GONE state for every camera, held in flat arrays.
+
+    `update()` is called once per processed frame and only marks whether a person was
+    seen (inside the camera's zones, if any). `evaluate()` runs once per main loop and
+    computes the transitions of all cameras in one vectorized pass: a camera becomes
+    present on its first sighting and gone once it has not seen anyone for its grace
+    period. Alert payloads are pre-encoded per camera, so an event only splices in the
+    time string.
+
+    Zones are rectangles in 0..1 frame coordinates; a detection counts when its
+    bottom-centre point (where the person stands) is inside any of them.
+    """
+
+    def __init__(self, grace_period=2.5):
+        self.default_grace_period = grace_period
+        self.cam_ids = [] # array index -> camera id
+        self.index = {} # camera id -> array index
+        self.present = np.zeros(0, dtype=bool)
+        self.seen = np.zeros(0, dtype=bool) # Person seen since the last evaluate()
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self.grace = np.zeros(0, dtype=np.float64)
+        self.zones = [] # per index: None or float32 array (Z, 4)
+        self.templates = [] # per index: {status: (prefix, suffix)}
+
+    def add_camera(self, cam_id, grace_period=None, zones=None):
+        if cam_id in self.index:
+            raise ValueError(f"camera {cam_id} is already tracked")
+        self.index[cam_id] = len(self.cam_ids)
+        self.cam_ids.append(cam_id)
+        self.present = np.append(self.present, False)
+        self.seen = np.append(self.seen, False)
+        self.last_seen = np.append(self.last_seen, 0.0)
+        self.grace = np.append(self.grace, self.default_grace_period if grace_period is None else grace_period)
+        self.zones.append(None)
+        self.set_zones(cam_id, zones)
+        name = f"Camera {cam_id}"
+        self.templates.append({
+            PERSON_DETECTED: _payload_template({
+                "status": PERSON_DETECTED,
+                "camera_id": name,
+                "message": f"Unauthorized Entrance! Person Detected from {name} at {_TIME_PLACEHOLDER}"
+            }),
+            PERSON_GONE: _payload_template({
+                "status": PERSON_GONE,
+                "camera_id": name,
+                "message": f"Person no longer detected at {name} ({_TIME_PLACEHOLDER})"
+            })
+        })
+
+    def remove_camera(self, cam_id, now=None):
+        """Stops tracking `cam_id`. If a person was present, returns the final PERSON_GONE event
+        (same tuple as evaluate()) so listeners are not left waiting for a departure; else None."""
+        i = self.index[cam_id]
+        event = None
+        if self.present[i]:
+            now = time.time() if now is None else now
+            prefix, suffix = self.templates[i][PERSON_GONE]
+            stamp = time.strftime('%H:%M:%S', time.localtime(now)).encode()
+            event = (cam_id, PERSON_GONE, prefix + stamp + suffix, float(now - self.last_seen[i]))
+        del self.index[cam_id]
+        del self.cam_ids[i]
+        del self.zones[i]
+        del self.templates[i]
+        self.present = np.delete(self.present, i)
+        self.seen = np.delete(self.seen, i)
+        self.last_seen = np.delete(self.last_seen, i)
+        self.grace = np.delete(self.grace, i)
+        self.index = {cam: idx for idx, cam in enumerate(self.cam_ids)}
+        return event
+
+    def set_grace_period(self, cam_id, seconds):
+        self.grace[self.index[cam_id]] = seconds
+
+    def set_zones(self, cam_id, zones):
+        """`zones`: iterable of (x1, y1, x2, y2) in 0..1, or None/empty for the whole frame."""
+        self.zones[self.index[cam_id]] = np.asarray(zones, dtype=np.float32).reshape(-1, 4) if zones else None
+
+    def update(self, cam_id, boxes, frame_shape, now=None):
+        """Records one processed frame. `boxes` are [x, y, w, h] in pixels. Returns True if a person counts."""
+        if len(boxes) == 0:
+            return False
+        i = self.index[cam_id]
+        zones = self.zones[i]
+        if zones is None:
+            seen = True
+        else:
+            b = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+            h, w = frame_shape[:2]
+            fx = (b[:, 0] + b[:, 2] / 2) / w
+            fy = (b[:, 1] + b[:, 3]) / h
+            inside = ((fx[:, None] >= zones[:, 0]) & (fx[:, None] <= zones[:, 2])
+                      & (fy[:, None] >= zones[:, 1]) & (fy[:, None] <= zones[:, 3]))
+            seen = bool(inside.any())
+        if seen:
+            self.seen[i] = True
+            self.last_seen[i] = time.time() if now is None else now
+        return seen
+
+    def evaluate(self, now=None):
+        """All transitions since the last call, as (cam_id, status, payload_bytes, seconds_unseen)."""
+        now = time.time() if now is None else now
+        detected = self.seen & ~self.present
+        gone = self.present & ~self.seen & (now - self.last_seen > self.grace)
+        self.seen[:] = False
+        if not (detected.any() or gone.any()):
+            return []
+        self.present |= detected
+        self.present &= ~gone
+
+        stamp = time.strftime('%H:%M:%S', time.localtime(now)).encode()
+        events = []
+        for status, indices in ((PERSON_DETECTED, np.flatnonzero(detected)), (PERSON_GONE, np.flatnonzero(gone))):
+            for i in indices:
+                prefix, suffix = self.templates[i][status]
+                events.append((self.cam_ids[i], status, prefix + stamp + suffix, float(now - self.last_seen[i])))
+        return events
+
+    def is_present(self, cam_id):
+        return bool(self.present[self.index[cam_id]])
@@ -0,0 +1,153 @@
+import time
+from datetime import datetime
+
+import cv2
+
+from display import DisplayWindow
+from inference import to_detection_dicts
+from presence import PERSON_DETECTED
+
+# MQTT Topics
+TOPIC_ALERT = "smart_office/camera/alert"
+TOPIC_LOG = "smart_office/camera/detection_log"
+TOPIC_STREAM = "smart_office/camera/{}/stream" # Formatted with the camera id
+
+# Longest stretch of detections buffered before a detection log is sent anyway
+DETECTION_LOG_MAX_PERIOD = 60.0
+
+# Quiet time after the last detection before the detection log is sent
+DETECTION_LOG_QUIET_PERIOD = 5.0
+
+
+class FrameProcessor:
+    """Everything main.py does with a frame once it has detections for it.
+
+    process_frame() buffers the detections for the detection log, feeds the presence
+    tracker and rate controller, then draws, shows, encodes and publishes the frame if
+    it is displayed locally or someone watches its stream. end_pass() publishes presence
+    transitions and the detection log once per loop. The load test drives the same
+    object, so what it measures is what main.py runs.
+    """
+
+    def __init__(self, mqtt_client, presence_tracker, rate_controller, viewer_tracker=None, stream_server=None,
+                 always_stream=False, headless=True, jpeg_quality=75, soak_monitor=None):
+        self.mqtt_client = mqtt_client
+        self.presence_tracker = presence_tracker
+        self.rate_controller = rate_controller
+        self.viewer_tracker = viewer_tracker
+        self.stream_server = stream_server
+        self.always_stream = always_stream
+        self.headless = headless
+        self.jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality] # Changeable at runtime
+        self.soak_monitor = soak_monitor
+        self.drawers = {} # We need the drawing object even if headless, for stream annotations
+        self.streaming_state = {} # Last watched/unwatched decision, for logging transitions
+        self.detection_buffers = {}
+        self.detection_fps = {}
+        self.last_detection_time = 0.0 # Timestamp of the last detection event on *any* camera
+        self.log_period_start_time = 0.0 # First detection buffered since the last log was sent
+
+    def add_camera(self, cam_id):
+        self.drawers[cam_id] = DisplayWindow(f"Camera {cam_id}")
+        if not self.headless:
+            self.drawers[cam_id].create_window() # Create windows only if not headless
+        self.streaming_state[cam_id] = None
+        self.detection_buffers.setdefault(cam_id, [])
+        self.detection_fps[cam_id] = 0.0
+
+    def remove_camera(self, cam_id):
+        drawer = self.drawers.pop(cam_id)
+        if not self.headless:
+            drawer.close()
+        for per_camera in (self.streaming_state, self.detection_fps):
+            per_camera.pop(cam_id, None)
+        # detection_buffers[cam_id] is kept until the next detection log is sent
+
+    def close(self):
+        if not self.headless:
+            for drawer in self.drawers.values():
+                drawer.close()
+
+    def is_stream_wanted(self, cam_id):
+        wanted = (self.always_stream
+                  or (self.viewer_tracker is not None and self.viewer_tracker.is_watched(cam_id))
+                  or (self.stream_server is not None and self.stream_server.client_count(cam_id) > 0))
+        if wanted != self.streaming_state[cam_id]:
+            self.streaming_state[cam_id] = wanted
+            print(f"[INFO] Camera {cam_id} stream {'active' if wanted else 'paused (no viewers)'}.")
+        return wanted
+
+    def process_frame(self, cam_id, frame, detections, detection_time, now):
+        """Handles one frame and its raw detector output; returns the {'bbox', 'score'} detections."""
+        if self.soak_monitor:
+            self.soak_monitor.record_latency('detect', detection_time)
+        self.detection_fps[cam_id] = 1.0 / detection_time if detection_time > 0 else 0 # Avoid division by zero
+
+        processed_detections = to_detection_dicts(detections, frame.shape)
+        for det in processed_detections:
+            self.detection_buffers[cam_id].append({
+                "timestamp": datetime.now().isoformat(),
+                "confidence": det['score'],
+                "bbox": det['bbox']
+            })
+        person_detected = bool(processed_detections)
+
+        # Presence only counts detections inside the camera's zones; transitions are evaluated in end_pass()
+        self.presence_tracker.update(cam_id, [d['bbox'] for d in processed_detections], frame.shape, now)
+        if person_detected:
+            if self.last_detection_time == 0.0:
+                self.log_period_start_time = now
+            self.last_detection_time = now # Global log timer
+        self.rate_controller.record(cam_id, detection_time, person_detected, now)
+
+        # Draw and encode only when the frame is shown locally or someone is watching its stream
+        stream_wanted = self.is_stream_wanted(cam_id)
+        render_start_time = time.time()
+        if not self.headless or stream_wanted:
+            annotated_frame = self.drawers[cam_id].draw_overlays(frame, detections=processed_detections,
+                                                                 fps=self.detection_fps[cam_id])
+
+        if not self.headless:
+            cv2.imshow(self.drawers[cam_id].window_name, annotated_frame)
+
+        if stream_wanted:
+            ret, buffer = cv2.imencode('.jpg', annotated_frame, self.jpeg_params)
+            if ret:
+                jpeg_bytes = buffer.tobytes()
+                self.mqtt_client.publish(TOPIC_STREAM.format(cam_id), jpeg_bytes, qos=0)
+                if self.stream_server:
+                    self.stream_server.update_frame(cam_id, jpeg_bytes)
+            else:
+                print(f"[WARN] Failed to encode camera {cam_id} frame for MQTT.")
+        if self.soak_monitor and stream_wanted:
+            self.soak_monitor.record_latency('render', time.time() - render_start_time)
+        return processed_detections
+
+    def publish_presence_event(self, cam_id, status, alert_payload, unseen_for):
+        """Publishes one PresenceTracker event to TOPIC_ALERT."""
+        self.mqtt_client.publish(TOPIC_ALERT, alert_payload, qos=1)
+        if status == PERSON_DETECTED:
+            print(f"[MQTT] Sent PERSON_DETECTED alert for Camera {cam_id}")
+        else:
+            print(f"[MQTT] Sent PERSON_GONE for Cam{cam_id}. Grace: {unseen_for:.1f}s.")
+
+    def end_pass(self, now):
+        """Publishes presence transitions for all cameras and, when due, the detection log."""
+        for event in self.presence_tracker.evaluate(time.time()):
+            self.publish_presence_event(*event)
+
+        if self.last_detection_time == 0.0:
+            return
+        # Also flush while someone stays in view, so the buffers cannot grow without bound
+        log_overdue = (now - self.log_period_start_time) > DETECTION_LOG_MAX_PERIOD
+        if log_overdue or (now - self.last_detection_time) > DETECTION_LOG_QUIET_PERIOD:
+            if any(self.detection_buffers.values()):
+                print(f"[MQTT] Sending detection log ({(now - self.last_detection_time):.1f}s since last detection, "
+                      f"{now - self.log_period_start_time:.0f}s buffered)")
+                log_payload = {"detection_period_end": datetime.now().isoformat()}
+                for cam_id, buffer in sorted(self.detection_buffers.items()):
+                    log_payload[f"camera_{cam_id}_detections"] = buffer
+                self.mqtt_client.publish(TOPIC_LOG, log_payload, qos=1)
+            # Start fresh buffers for current cameras; removed cameras' buffers end here
+            self.detection_buffers = {cam_id: [] for cam_id in self.drawers}
+            self.last_detection_time = 0.0
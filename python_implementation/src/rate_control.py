@@ -0,0 +1,242 @@
+import os
+import time
+
+TOPIC_RATE_CONTROL = "smart_office/edge/rate_control"
+
+THERMAL_ZONE_PATH = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def read_system_load():
+    """1-minute load average per CPU core, or 0.0 where it is not available."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return 0.0
+
+
+def read_cpu_temperature():
+    """SoC temperature in degrees C (Raspberry Pi / most Linux boards), or None."""
+    try:
+        with open(THERMAL_ZONE_PATH) as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+class RateController:
+    """Adjusts how often each camera is run through detection to hold a target loop latency.
+
+    The main loop still ticks at `max_fps`; each camera is only processed when its own
+    (adaptive) rate says it is due. Every `adjust_interval` seconds the controller looks
+    at the smoothed loop work time, the share of loops that overran their interval, the
+    system load and the SoC temperature:
+
+    * overloaded: rates are cut multiplicatively, idle cameras (no person for
+      `idle_after` seconds) first; cameras that currently see someone are only slowed
+      once every idle camera is already at `min_fps`. Within a group the most expensive
+      cameras (rate x smoothed inference time) are cut first, and only as many as it
+      takes to bring the total detection cost back under the loop's budget.
+    * comfortably under target: rates are raised additively, active cameras first.
+
+    A camera that sees a person while degraded is restored to `max_fps` immediately.
+    """
+
+    def __init__(self, camera_ids, max_fps=20.0, min_fps=1.0, target_latency=0.1, idle_after=10.0,
+                 adjust_interval=1.0, load_limit=0.9, thermal_limit=80.0, enabled=True):
+        self.max_fps = max_fps
+        self.min_fps = min(min_fps, max_fps)
+        self.loop_interval = 1.0 / max_fps
+        self.target_latency = target_latency
+        self.idle_after = idle_after
+        self.adjust_interval = adjust_interval
+        self.load_limit = load_limit
+        self.thermal_limit = thermal_limit
+        self.enabled = enabled
+
+        now = time.time()
+        self.rates = {cam: max_fps for cam in camera_ids}
+        self.next_due = {cam: 0.0 for cam in camera_ids}
+        self.last_person_time = {cam: now for cam in camera_ids} # Nobody is idle right after startup
+        self.inference_time = {cam: 0.0 for cam in camera_ids} # EWMA, seconds
+        self.processed = {cam: 0 for cam in camera_ids} # Totals since start
+        self.deferred = {cam: 0 for cam in camera_ids}
+        self.window_processed = {cam: 0 for cam in camera_ids}
+        self.effective_fps = {cam: 0.0 for cam in camera_ids}
+
+        self.latency = 0.0 # EWMA of loop work time, seconds
+        self.window_loops = 0
+        self.window_overruns = 0
+        self.overrun_ratio = 0.0
+        self.load = 0.0
+        self.temperature = None
+        self.state = 'normal'
+        self.last_action = 'none'
+        self.adjustments = 0
+        self.last_adjust_time = now
+
+    def add_camera(self, cam_id):
+        now = time.time()
+        self.rates[cam_id] = self.max_fps
+        self.next_due[cam_id] = 0.0
+        self.last_person_time[cam_id] = now
+        self.inference_time[cam_id] = 0.0
+        self.processed[cam_id] = 0
+        self.deferred[cam_id] = 0
+        self.window_processed[cam_id] = 0
+        self.effective_fps[cam_id] = 0.0
+
+    def remove_camera(self, cam_id):
+        for per_camera in (self.rates, self.next_due, self.last_person_time, self.inference_time,
+                           self.processed, self.deferred, self.window_processed, self.effective_fps):
+            per_camera.pop(cam_id, None)
+
+    def set_max_fps(self, max_fps):
+        """Changes the loop rate and per-camera ceiling; current rates are clamped, not reset."""
+        self.max_fps = max_fps
+        self.min_fps = min(self.min_fps, max_fps)
+        self.loop_interval = 1.0 / max_fps
+        for cam in self.rates:
+            self.rates[cam] = min(self.rates[cam], max_fps) if self.enabled else max_fps
+
+    def should_process(self, cam_id, now=None):
+        """True if `cam_id` is due for detection this loop iteration."""
+        if not self.enabled:
+            return True
+        now = time.time() if now is None else now
+        # Half a loop of tolerance so a loop that wakes slightly early does not halve the rate
+        if now < self.next_due[cam_id] - self.loop_interval / 2:
+            self.deferred[cam_id] += 1
+            return False
+        self.next_due[cam_id] = max(self.next_due[cam_id] + 1.0 / self.rates[cam_id], now)
+        return True
+
+    def record(self, cam_id, detection_time, person_present, now=None):
+        """Feeds back the result of one processed frame."""
+        now = time.time() if now is None else now
+        self.processed[cam_id] += 1
+        self.window_processed[cam_id] += 1
+        self.inference_time[cam_id] = 0.8 * self.inference_time[cam_id] + 0.2 * detection_time
+        if person_present:
+            if self.enabled and self._is_idle(cam_id, now) and self.rates[cam_id] < self.max_fps:
+                print(f"[RateCtl] Person on degraded camera {cam_id}: restoring "
+                      f"{self.rates[cam_id]:.1f} -> {self.max_fps:.1f} fps")
+                self.rates[cam_id] = self.max_fps
+                self.next_due[cam_id] = now
+            self.last_person_time[cam_id] = now
+
+    def end_loop(self, work_time, now=None):
+        """Call once per main loop iteration with the time spent before sleeping."""
+        now = time.time() if now is None else now
+        self.latency = 0.8 * self.latency + 0.2 * work_time
+        self.window_loops += 1
+        if work_time > self.loop_interval:
+            self.window_overruns += 1
+        if now - self.last_adjust_time >= self.adjust_interval:
+            self._adjust(now)
+
+    def _is_idle(self, cam_id, now):
+        return now - self.last_person_time[cam_id] > self.idle_after
+
+    def _cost(self, cam_id):
+        """Seconds of detection per second this camera costs at its current rate."""
+        return self.rates[cam_id] * self.inference_time[cam_id]
+
+    def cost_budget(self):
+        """Seconds of detection per second the loop can afford while meeting the target latency."""
+        return min(1.0, self.target_latency * self.max_fps)
+
+    def _adjust(self, now):
+        elapsed = now - self.last_adjust_time
+        self.last_adjust_time = now
+        self.overrun_ratio = self.window_overruns / self.window_loops if self.window_loops else 0.0
+        self.effective_fps = {cam: n / elapsed for cam, n in self.window_processed.items()}
+        self.window_processed = {cam: 0 for cam in self.window_processed}
+        self.window_loops = 0
+        self.window_overruns = 0
+        self.load = read_system_load()
+        self.temperature = read_cpu_temperature()
+
+        pressure = self.latency / self.target_latency if self.target_latency > 0 else 0.0
+        hot = self.temperature is not None and self.temperature >= self.thermal_limit
+        reasons = []
+        if pressure > 1.0:
+            reasons.append(f"latency {self.latency * 1000:.0f}ms > {self.target_latency * 1000:.0f}ms")
+        if self.overrun_ratio > 0.25:
+            reasons.append(f"{self.overrun_ratio * 100:.0f}% loops overran")
+        if self.load > self.load_limit:
+            reasons.append(f"load {self.load:.2f}/core")
+        if hot:
+            reasons.append(f"{self.temperature:.0f}C")
+        underloaded = (pressure < 0.7 and self.overrun_ratio == 0.0
+                       and self.load < self.load_limit * 0.8 and not hot)
+
+        self.state = 'overloaded' if reasons else ('recovering' if underloaded else 'holding')
+        if not self.enabled:
+            return
+
+        idle = [cam for cam in self.rates if self._is_idle(cam, now)]
+        active = [cam for cam in self.rates if cam not in idle]
+        if reasons:
+            # Shed idle cameras first; cameras that currently see someone keep their rate as long as possible
+            factor = max(0.5, min(0.8, 1.0 / pressure)) if pressure > 1.0 else 0.8
+            excess = sum(self._cost(cam) for cam in self.rates) - self.cost_budget()
+            for group, label in ((idle, 'idle'), (active, 'active')):
+                targets = sorted((cam for cam in group if self.rates[cam] > self.min_fps), key=self._cost, reverse=True)
+                if targets:
+                    # Most expensive first, until the cuts cover the excess cost (always at least one camera,
+                    # since the pressure may come from drawing/encoding or the SoC rather than detection)
+                    chosen = []
+                    for cam in targets:
+                        chosen.append(cam)
+                        excess -= self._cost(cam) * (1.0 - factor)
+                        if excess <= 0:
+                            break
+                    self._set_rates(chosen, lambda r: max(self.min_fps, r * factor), label, ", ".join(reasons))
+                    break
+        elif underloaded:
+            step = self.max_fps * 0.1
+            for group, label in ((active, 'active'), (idle, 'idle')):
+                targets = [cam for cam in group if self.rates[cam] < self.max_fps]
+                if targets:
+                    self._set_rates(targets, lambda r: min(self.max_fps, r + step), label,
+                                    f"latency {self.latency * 1000:.0f}ms")
+                    break
+
+    def _set_rates(self, cams, update, label, reason):
+        changes = []
+        for cam in cams:
+            old = self.rates[cam]
+            self.rates[cam] = update(old)
+            changes.append(f"camera {cam} ({label}) {old:.1f} -> {self.rates[cam]:.1f}")
+        self.adjustments += 1
+        self.last_action = f"{'decrease' if self.state == 'overloaded' else 'increase'} {label}"
+        print(f"[RateCtl] {self.state} ({reason}): {'; '.join(changes)} fps")
+
+    def metrics(self):
+        """Current decisions and the signals behind them, as a JSON-serialisable dict."""
+        now = time.time()
+        return {
+            "timestamp": now,
+            "enabled": self.enabled,
+            "state": self.state,
+            "last_action": self.last_action,
+            "adjustments": self.adjustments,
+            "latency_ms": round(self.latency * 1000, 1),
+            "target_latency_ms": round(self.target_latency * 1000, 1),
+            "overrun_ratio": round(self.overrun_ratio, 3),
+            "load_per_core": round(self.load, 2),
+            "temperature_c": self.temperature,
+            "detection_cost": round(sum(self._cost(cam) for cam in self.rates), 3),
+            "cost_budget": round(self.cost_budget(), 3),
+            "cameras": {
+                str(cam): {
+                    "target_fps": round(self.rates[cam], 2),
+                    "effective_fps": round(self.effective_fps[cam], 2),
+                    "idle": self._is_idle(cam, now),
+                    "inference_ms": round(self.inference_time[cam] * 1000, 1),
+                    "cost": round(self._cost(cam), 3),
+                    "processed": self.processed[cam],
+                    "deferred": self.deferred[cam]
+                } for cam in self.rates
+            }
+        }
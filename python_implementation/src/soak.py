@@ -0,0 +1,186 @@
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def read_rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is not available)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def fit_trend(times, values):
+    """(slope per hour, correlation) of a least-squares line through the samples."""
+    t = np.asarray(times, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64)
+    if len(t) < 3 or np.ptp(t) == 0:
+        return 0.0, 0.0
+    slope = float(np.polyfit(t, v, 1)[0]) * 3600.0
+    if np.ptp(v) == 0:
+        return slope, 0.0
+    return slope, float(np.corrcoef(t, v)[0, 1])
+
+
+class SoakMonitor:
+    """Samples memory, queue depths and per-stage latency during a long run and reports drift.
+
+    Every `interval` seconds a background thread records RSS, tracemalloc's traced total
+    and top allocators, every registered gauge (queue or buffer length) and the p50/p95
+    of each stage's latencies since the previous sample. `report()` fits a line through
+    each series (after the first `warmup` fraction of samples) and flags series that
+    grow steadily: correlation >= `min_correlation` and growth over the run of at least
+    `growth_threshold` relative to the series' starting level.
+    """
+
+    def __init__(self, interval=60.0, duration=None, top_allocators=10, tracemalloc_frames=1,
+                 warmup=0.2, growth_threshold=0.1, min_correlation=0.8):
+        self.interval = interval
+        self.duration = duration
+        self.top_allocators = top_allocators
+        self.tracemalloc_frames = tracemalloc_frames
+        self.warmup = warmup
+        self.growth_threshold = growth_threshold
+        self.min_correlation = min_correlation
+        self.gauges = {} # name -> zero-argument callable returning a number
+        self.latencies = {} # stage -> [seconds] since the last sample
+        self.latency_lock = threading.Lock()
+        self.samples = []
+        self.baseline_snapshot = None
+        self.last_snapshot = None
+        self.start_time = None
+        self.stop_event = threading.Event()
+        self._thread = None
+
+    def add_gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def record_latency(self, stage, seconds):
+        with self.latency_lock:
+            self.latencies.setdefault(stage, []).append(seconds)
+
+    @property
+    def finished(self):
+        return self.duration is not None and self.start_time is not None and time.time() - self.start_time >= self.duration
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        self.start_time = time.time()
+        self.baseline_snapshot = tracemalloc.take_snapshot()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        limit = f" for {self.duration / 3600:.1f}h" if self.duration else ""
+        print(f"[Soak] Sampling every {self.interval:.0f}s{limit}.")
+        return self
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        now = time.time()
+        with self.latency_lock:
+            latencies, self.latencies = self.latencies, {}
+        snapshot = tracemalloc.take_snapshot()
+        self.last_snapshot = snapshot
+        traced, _ = tracemalloc.get_traced_memory()
+        gauges = {}
+        for name, fn in self.gauges.items():
+            try:
+                gauges[name] = float(fn())
+            except Exception as e: # A gauge must never take the soak run down
+                print(f"[Soak] Gauge {name} failed: {e}")
+        sample = {
+            "elapsed_s": round(now - self.start_time, 1),
+            "rss_mb": round(read_rss_mb(), 2),
+            "traced_mb": round(traced / 2 ** 20, 2),
+            "gauges": gauges,
+            "latency_ms": {
+                stage: {"count": len(values),
+                        "p50": round(float(np.percentile(values, 50)) * 1000, 2),
+                        "p95": round(float(np.percentile(values, 95)) * 1000, 2)}
+                for stage, values in latencies.items() if values
+            },
+            "top_allocators": [
+                {"where": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in snapshot.statistics('lineno')[:self.top_allocators]
+            ]
+        }
+        self.samples.append(sample)
+        print(f"[Soak] t={sample['elapsed_s'] / 60:.1f}min rss={sample['rss_mb']:.1f}MB traced={sample['traced_mb']:.1f}MB "
+              + " ".join(f"{name}={value:g}" for name, value in gauges.items()))
+        return sample
+
+    def _series(self):
+        series = {"rss_mb": [], "traced_mb": []}
+        for s in self.samples:
+            series["rss_mb"].append((s["elapsed_s"], s["rss_mb"]))
+            series["traced_mb"].append((s["elapsed_s"], s["traced_mb"]))
+            for name, value in s["gauges"].items():
+                series.setdefault(f"gauge:{name}", []).append((s["elapsed_s"], value))
+            for stage, stats in s["latency_ms"].items():
+                series.setdefault(f"latency_p95_ms:{stage}", []).append((s["elapsed_s"], stats["p95"]))
+        return series
+
+    def report(self):
+        """Trend of every series plus the allocation sites that grew most since start."""
+        trends = []
+        for name, points in self._series().items():
+            points = points[int(len(points) * self.warmup):]
+            if len(points) < 3:
+                continue
+            times, values = zip(*points)
+            slope, correlation = fit_trend(times, values)
+            growth = slope * (times[-1] - times[0]) / 3600.0
+            base = max(abs(values[0]), 1.0)
+            flagged = bool(correlation >= self.min_correlation and growth / base >= self.growth_threshold)
+            trends.append({"series": name, "first": values[0], "last": values[-1], "per_hour": round(slope, 3),
+                           "correlation": round(correlation, 3), "growth_pct": round(100 * growth / base, 1),
+                           "flagged": flagged})
+
+        growing = []
+        if self.baseline_snapshot is not None and self.last_snapshot is not None:
+            for stat in self.last_snapshot.compare_to(self.baseline_snapshot, 'lineno')[:self.top_allocators]:
+                if stat.size_diff > 0:
+                    growing.append({"where": str(stat.traceback), "size_diff_kb": round(stat.size_diff / 1024, 1),
+                                    "count_diff": stat.count_diff})
+        return {
+            "duration_s": round(time.time() - self.start_time, 1) if self.start_time else 0.0,
+            "samples": len(self.samples),
+            "trends": trends,
+            "flagged": [t["series"] for t in trends if t["flagged"]],
+            "top_growing_allocators": growing
+        }
+
+    def stop(self, report_path=None):
+        """Takes a final sample, prints the drift report and optionally writes it with all samples as JSON."""
+        self.stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        if self.start_time is None:
+            return None
+        self.sample()
+        report = self.report()
+        print(f"[Soak] Drift report after {report['duration_s'] / 3600:.2f}h, {report['samples']} samples:")
+        for t in report["trends"]:
+            print(f"[Soak]   {'DRIFT' if t['flagged'] else 'ok   '} {t['series']:<40} {t['first']:>10.2f} -> {t['last']:>10.2f} "
+                  f"({t['per_hour']:+.3f}/h, r={t['correlation']:.2f})")
+        for a in report["top_growing_allocators"][:5]:
+            print(f"[Soak]   +{a['size_diff_kb']:.1f}KB ({a['count_diff']:+d} blocks) at {a['where']}")
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump({"report": report, "samples": self.samples}, f, indent=2)
+            print(f"[Soak] Report written to {os.path.abspath(report_path)}")
+        tracemalloc.stop()
+        return report
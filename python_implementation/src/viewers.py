@@ -0,0 +1,53 @@
+import json
+import threading
+import time
+
+TOPIC_VIEWER_HEARTBEAT = "smart_office/viewer/heartbeat"
+
+
+class ViewerTracker:
+    """Tracks which cameras remote viewers are watching, from their MQTT heartbeats.
+
+    Viewers publish `{"viewer_id": ..., "cameras": [0, 1]}` to TOPIC_VIEWER_HEARTBEAT
+    every few seconds, an empty camera list when they close, and the same empty list
+    as their last will if they drop off. A viewer that stops sending heartbeats is
+    ignored after `timeout` seconds and dropped at the next heartbeat from anyone, so
+    the table never outgrows the viewers active within one timeout.
+    """
+
+    def __init__(self, timeout=6.0):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.viewers = {} # viewer_id -> (set of camera ids, last heartbeat time)
+
+    def on_heartbeat(self, topic, payload):
+        try:
+            data = json.loads(payload.decode())
+            viewer_id = str(data["viewer_id"])
+            cameras = {int(cam) for cam in data.get("cameras", [])}
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"[Viewers] Ignoring malformed heartbeat: {e}")
+            return
+        now = time.time()
+        with self.lock:
+            expired = [vid for vid, (_, last_seen) in self.viewers.items() if now - last_seen > self.timeout]
+            for vid in expired:
+                del self.viewers[vid]
+            is_new = viewer_id not in self.viewers
+            if cameras:
+                self.viewers[viewer_id] = (cameras, now)
+            else:
+                self.viewers.pop(viewer_id, None)
+        for vid in expired:
+            if vid != viewer_id:
+                print(f"[Viewers] Viewer {vid} timed out.")
+        if cameras and is_new:
+            print(f"[Viewers] Viewer {viewer_id} is watching cameras {sorted(cameras)}.")
+        elif not cameras and not is_new:
+            print(f"[Viewers] Viewer {viewer_id} left.")
+
+    def is_watched(self, cam_id):
+        now = time.time()
+        with self.lock:
+            return any(cam_id in cameras and now - last_seen <= self.timeout
+                       for cameras, last_seen in self.viewers.values())